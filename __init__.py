@@ -1,36 +1,44 @@
-from .multi_lora_loader import NODE_CLASS_MAPPINGS as MULTI_LORA_LOADER_NODE_CLASS_MAPPINGS
-from .multi_lora_loader import NODE_DISPLAY_NAME_MAPPINGS as MULTI_LORA_LOADER_NODE_DISPLAY_NAME_MAPPINGS
-from .multi_trigger_loader import NODE_CLASS_MAPPINGS as MULTI_TRIGGER_LOADER_NODE_CLASS_MAPPINGS
-from .multi_trigger_loader import NODE_DISPLAY_NAME_MAPPINGS as MULTI_TRIGGER_LOADER_NODE_DISPLAY_NAME_MAPPINGS
-from .multi_loraname_loader import NODE_CLASS_MAPPINGS as MULTI_LORANAME_LOADER_NODE_CLASS_MAPPINGS
-from .multi_loraname_loader import NODE_DISPLAY_NAME_MAPPINGS as MULTI_LORANAME_LOADER_NODE_DISPLAY_NAME_MAPPINGS
-from .lora_adapter import NODE_CLASS_MAPPINGS as LORA_ADAPTER_NODE_CLASS_MAPPINGS
-from .lora_adapter import NODE_DISPLAY_NAME_MAPPINGS as LORA_ADAPTER_NODE_DISPLAY_NAME_MAPPINGS
-from .dynamic_lora_loader import NODE_CLASS_MAPPINGS as DYNAMIC_LORA_LOADER_NODE_CLASS_MAPPINGS
-from .dynamic_lora_loader import NODE_DISPLAY_NAME_MAPPINGS as DYNAMIC_LORA_LOADER_NODE_DISPLAY_NAME_MAPPINGS
-from .image_batch_to_list import NODE_CLASS_MAPPINGS as IMAGE_BATCH_TO_LIST_NODE_CLASS_MAPPINGS
-from .image_batch_to_list import NODE_DISPLAY_NAME_MAPPINGS as IMAGE_BATCH_TO_LIST_NODE_DISPLAY_NAME_MAPPINGS
-from .convert_greyscale import NODE_CLASS_MAPPINGS as CONVERT_GREYSCALE_NODE_CLASS_MAPPINGS
-from .convert_greyscale import NODE_DISPLAY_NAME_MAPPINGS as CONVERT_GREYSCALE_NODE_DISPLAY_NAME_MAPPINGS
+import importlib
+import time
 
-NODE_CLASS_MAPPINGS = {
-    **MULTI_LORA_LOADER_NODE_CLASS_MAPPINGS,
-    **MULTI_TRIGGER_LOADER_NODE_CLASS_MAPPINGS,
-    **MULTI_LORANAME_LOADER_NODE_CLASS_MAPPINGS,
-    **LORA_ADAPTER_NODE_CLASS_MAPPINGS,
-    **DYNAMIC_LORA_LOADER_NODE_CLASS_MAPPINGS,
-    **IMAGE_BATCH_TO_LIST_NODE_CLASS_MAPPINGS,
-    **CONVERT_GREYSCALE_NODE_CLASS_MAPPINGS
-}
+from .instrumentation import logger, record_span, register_stats_route
+from .lora_preload import start_preload
 
-NODE_DISPLAY_NAME_MAPPINGS = {
-    **MULTI_LORA_LOADER_NODE_DISPLAY_NAME_MAPPINGS,
-    **MULTI_TRIGGER_LOADER_NODE_DISPLAY_NAME_MAPPINGS,
-    **MULTI_LORANAME_LOADER_NODE_DISPLAY_NAME_MAPPINGS,
-    **LORA_ADAPTER_NODE_DISPLAY_NAME_MAPPINGS,
-    **DYNAMIC_LORA_LOADER_NODE_DISPLAY_NAME_MAPPINGS,
-    **IMAGE_BATCH_TO_LIST_NODE_DISPLAY_NAME_MAPPINGS,
-    **CONVERT_GREYSCALE_NODE_DISPLAY_NAME_MAPPINGS
-}
+# ComfyUI reads the node classes as soon as the package is loaded, so every
+# node module is imported here. They must stay cheap to import: torch, PIL,
+# comfy and LoRA directory scans belong inside the functions that use them.
+# Import times are recorded under "loras_loader" in /loras_loader/stats.
+NODE_MODULES = (
+    "multi_lora_loader",
+    "multi_trigger_loader",
+    "multi_loraname_loader",
+    "lora_adapter",
+    "dynamic_lora_loader",
+    "image_batch_to_list",
+    "convert_greyscale",
+    "lora_stack",
+    "sweep_planner",
+    "lora_trigger_words",
+)
 
-__all__ = ['NODE_CLASS_MAPPINGS', 'NODE_DISPLAY_NAME_MAPPINGS']
\ No newline at end of file
+NODE_CLASS_MAPPINGS = {}
+NODE_DISPLAY_NAME_MAPPINGS = {}
+
+_package_start = time.perf_counter()
+for _module_name in NODE_MODULES:
+    _start = time.perf_counter()
+    _module = importlib.import_module(f".{_module_name}", __name__)
+    record_span("loras_loader", f"import:{_module_name}", time.perf_counter() - _start)
+    NODE_CLASS_MAPPINGS.update(_module.NODE_CLASS_MAPPINGS)
+    NODE_DISPLAY_NAME_MAPPINGS.update(_module.NODE_DISPLAY_NAME_MAPPINGS)
+record_span("loras_loader", "import", time.perf_counter() - _package_start)
+logger.debug("Registered %d nodes in %.1f ms", len(NODE_CLASS_MAPPINGS),
+             (time.perf_counter() - _package_start) * 1000)
+
+# Expose timing and cache statistics at /loras_loader/stats when the server is running
+register_stats_route()
+
+# Scan the LoRA folders and load the preload set in the background
+start_preload()
+
+__all__ = ['NODE_CLASS_MAPPINGS', 'NODE_DISPLAY_NAME_MAPPINGS']
@@ -0,0 +1,489 @@
+"""Offline benchmarks for the LoRA loader nodes.
+
+ComfyUI is replaced by the stubs in comfy_stubs.py and LoRA libraries are
+generated on the fly, so this runs anywhere. Benchmarks that need torch or PIL
+are skipped (and listed as such) when those aren't installed.
+
+    python benchmarks/bench_loras_loader.py --sizes 10,1000,10000 --output new.json
+    python benchmarks/bench_loras_loader.py --output new.json --compare old.json
+
+The package import is measured in fresh interpreters and the run fails when it
+exceeds --import-budget-ms or pulls in torch, PIL, numpy or aiohttp.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+import comfy_stubs  # noqa: E402
+
+
+# Keep the index, snapshots and metadata in memory and don't preload, so a
+# benchmark run never overwrites the sidecar files of a real install
+ISOLATED_ENV = {
+    "LORAS_LOADER_INDEX_PATH": "",
+    "LORAS_LOADER_SNAPSHOT_PATH": "",
+    "LORAS_LOADER_METADATA_DB": "",
+    "LORAS_LOADER_PRELOAD": "0",
+}
+
+
+def measure(fn, repeat, setup=None):
+    """Time fn repeat times, calling setup (untimed) before each run."""
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+    return {
+        "min_s": min(times),
+        "median_s": statistics.median(times),
+        "mean_s": statistics.mean(times),
+        "repeat": repeat,
+    }
+
+
+class Recorder:
+    def __init__(self):
+        self.results = []
+        self.skipped = []
+
+    def add(self, name, params, timing, **extra):
+        self.results.append({"name": name, "params": params, **timing, **extra})
+        print(f"{name:<28} {json.dumps(params):<40} median {timing['median_s'] * 1000:10.3f} ms")
+
+    def skip(self, name, reason):
+        self.skipped.append({"name": name, "reason": reason})
+        print(f"{name:<28} skipped: {reason}")
+
+
+def bench_scan(rec, root, size, repeat):
+    lora_index = comfy_stubs.import_module("lora_index")
+    params = {"files": size}
+
+    rec.add("index_refresh_cold", params, measure(
+        lambda: lora_index.LoraIndex(None).refresh([root]), repeat))
+
+    index = lora_index.LoraIndex(None)
+    index.refresh([root])
+    rec.add("index_refresh_warm", params, measure(lambda: index.refresh([root]), repeat))
+
+    try:
+        multi_lora_loader = comfy_stubs.import_module("multi_lora_loader")
+    except ImportError as e:
+        rec.skip("input_types", str(e))
+        return
+    lora_index._index = lora_index.LoraIndex(None)
+    multi_lora_loader.MultiLoraLoader.INPUT_TYPES()
+    rec.add("input_types", params, measure(multi_lora_loader.MultiLoraLoader.INPUT_TYPES, repeat))
+
+
+def bench_resolve(rec, root, names, repeat, lookups=1000):
+    lora_index = comfy_stubs.import_module("lora_index")
+    lora_index._index = lora_index.LoraIndex(None)
+    lora_index.get_lora_index().refresh([root])
+    rng = random.Random(0)
+    sample = [rng.choice(names) for _ in range(lookups)]
+
+    def resolve_all():
+        for name in sample:
+            lora_index.resolve_lora_path(name, [root])
+
+    timing = measure(resolve_all, repeat)
+    rec.add("resolve", {"files": len(names), "lookups": lookups}, timing,
+            per_lookup_us=timing["median_s"] / lookups * 1e6)
+
+
+def bench_load(rec, paths, repeat):
+    lora_cache = comfy_stubs.import_module("lora_cache")
+    cache = lora_cache.get_lora_cache()
+
+    def load_all(**kwargs):
+        for path in paths:
+            lora_cache.load_lora_state_dict(path, **kwargs)
+
+    params = {"files": len(paths), "bytes": sum(os.path.getsize(p) for p in paths)}
+    rec.add("state_dict_load_cold", params, measure(load_all, repeat, setup=cache.clear))
+    load_all()
+    rec.add("state_dict_load_cached", params, measure(load_all, repeat))
+
+    if not comfy_stubs.has_torch():
+        rec.skip("state_dict_load_lazy", "torch is not installed")
+        return
+
+    def load_lazy():
+        for path in paths:
+            sd = lora_cache.load_lora_state_dict(path, lazy=True, include_clip=False)
+            for value in sd.values():
+                value.sum()
+
+    rec.add("state_dict_load_lazy", params, measure(load_lazy, repeat, setup=cache.clear))
+
+
+def bench_apply(rec, root, repeat):
+    try:
+        multi_lora_loader = comfy_stubs.import_module("multi_lora_loader")
+    except ImportError as e:
+        rec.skip("apply", str(e))
+        return
+    lora_index = comfy_stubs.import_module("lora_index")
+    lora_index._index = lora_index.LoraIndex(None)
+    node_cls = multi_lora_loader.MultiLoraLoader
+    with contextlib.redirect_stdout(io.StringIO()):
+        node_cls.INPUT_TYPES()
+    node = node_cls()
+    rec.add("apply", {"index": 0}, measure(lambda: node.load_lora("MODEL", 0, None, 1.0, 1.0), repeat))
+
+
+def bench_greyscale(rec, batch_sizes, image_size, repeat):
+    if not comfy_stubs.has_torch():
+        rec.skip("convert_greyscale", "torch is not installed")
+        return
+    import torch
+    convert_greyscale = comfy_stubs.import_module("convert_greyscale")
+    node = convert_greyscale.ConvertGreyscaleNode()
+
+    for batch_size in batch_sizes:
+        image = torch.rand(batch_size, image_size, image_size, 3, generator=torch.Generator().manual_seed(0))
+        timing = measure(lambda: node.convert_greyscale(image), repeat)
+        rec.add("convert_greyscale", {"batch": batch_size, "size": image_size}, timing,
+                images_per_s=batch_size / timing["median_s"])
+
+
+def check_greyscale_pil(rec):
+    """Check that ConvertGreyscaleNode matches PIL's convert("L") exactly.
+
+    The node used to convert through PIL, so any difference changes existing
+    workflows. Covers RGB, 1-channel and RGBA input, chunking and the
+    single-channel output. Returns False on a mismatch.
+    """
+    if not comfy_stubs.has_torch():
+        rec.skip("convert_greyscale_pil_diff", "torch is not installed")
+        return True
+    try:
+        import numpy as np
+        from PIL import Image
+    except ImportError as e:
+        rec.skip("convert_greyscale_pil_diff", str(e))
+        return True
+    import torch
+    node = comfy_stubs.import_module("convert_greyscale").ConvertGreyscaleNode()
+
+    generator = torch.Generator().manual_seed(1)
+    # Random values plus every uint8 level and the values just around them
+    levels = torch.arange(256, dtype=torch.float32) / 255.0
+    edges = torch.cat([levels, (levels - 1e-6).clamp(0, 1), (levels + 1e-6).clamp(0, 1), torch.tensor([0.0, 1.0])])
+    ok = True
+    for channels in (3, 1, 4):
+        image = torch.rand(3, 32, 32, channels, generator=generator)
+        flat = image.view(-1)
+        flat[:edges.numel()] = edges
+        # Shuffled copies of the edge values for the other channels
+        flat[edges.numel():2 * edges.numel()] = edges[torch.randperm(edges.numel(), generator=generator)]
+        for chunk_size, single_channel in ((0, False), (2, False), (0, True)):
+            ours = node.convert_greyscale(image, chunk_size=chunk_size, single_channel=single_channel)[0]
+            diff = 0.0
+            for i in range(image.shape[0]):
+                levels_u8 = (image[i].numpy() * 255.0).clip(0, 255).astype(np.uint8)
+                if channels == 1:
+                    levels_u8 = levels_u8[..., 0]
+                grey = Image.fromarray(levels_u8).convert("L")
+                reference = np.array(grey if single_channel else grey.convert("RGB")).astype(np.float32) / 255.0
+                if single_channel:
+                    reference = reference[..., None]
+                diff = max(diff, float(np.abs(ours[i].numpy() - reference).max()))
+            params = {"channels": channels, "chunk": chunk_size, "single_channel": single_channel}
+            rec.results.append({"name": "convert_greyscale_pil_diff", "params": params, "max_abs_diff": diff})
+            print(f"{'convert_greyscale_pil_diff':<28} {json.dumps(params):<40} max abs diff {diff}")
+            if diff > 0:
+                print(f"FAIL: convert_greyscale differs from PIL by {diff} for {params}")
+                ok = False
+    return ok
+
+
+# Largest relative error of a single tensor accepted after each conversion
+PRECISION_TOLERANCES = {"fp16": 1e-3, "bf16": 1e-2, "int8": 2e-2}
+SAFETENSORS_DTYPES = {"float16": "F16", "bfloat16": "BF16", "float32": "F32", "int8": "I8"}
+
+
+def check_precision_roundtrip(rec, workdir):
+    """Check that fp16, bf16 and int8 storage restore the weights on the CPU.
+
+    Covers in-memory conversion and int8 files packed like tools/convert_loras.py
+    writes them, read back through load_lora_state_dict. The fp16 LoRA has a
+    channel small enough that its int8 scale would be an fp16 subnormal.
+    Returns False if a tensor changes dtype, shape or more than the tolerance.
+    """
+    if not comfy_stubs.has_torch():
+        rec.skip("precision_roundtrip", "torch is not installed")
+        return True
+    import torch
+    lora_cache = comfy_stubs.import_module("lora_cache")
+    lora_precision = comfy_stubs.import_module("lora_precision")
+
+    generator = torch.Generator().manual_seed(2)
+    up = torch.randn(64, 8, generator=generator) * 1e-2
+    up[0] *= 1e-2  # scale of about 1e-6
+    state_dicts = {
+        "float16": {"unet.lora_up.weight": up.to(torch.float16),
+                    "unet.lora_down.weight": torch.randn(8, 64, generator=generator).to(torch.float16),
+                    "unet.alpha": torch.tensor(8.0, dtype=torch.float16)},
+        "float32": {"unet.lora_up.weight": up,
+                    "unet.conv.lora_down.weight": torch.randn(8, 4, 3, 3, generator=generator),
+                    "unet.alpha": torch.tensor(4.0)},
+    }
+
+    def error(reference, restored, dtype=None):
+        """Largest relative error of an output channel (row) of the tensor."""
+        if restored.dtype != (dtype or reference.dtype) or restored.shape != reference.shape:
+            return float("inf")
+        reference = reference.to(torch.float32).reshape(reference.shape[0] if reference.dim() else 1, -1)
+        difference = (reference - restored.to(torch.float32).reshape(reference.shape)).norm(dim=1)
+        norm = reference.norm(dim=1)
+        return (difference / norm.clamp(min=1e-30)).max().item()
+
+    def to_bytes(tensor):
+        return bytes(tensor.contiguous().reshape(-1).view(torch.uint8).tolist())
+
+    ok = True
+    for source_dtype, state_dict in state_dicts.items():
+        for precision, tolerance in PRECISION_TOLERANCES.items():
+            converted = lora_precision.convert_state_dict(state_dict, precision)
+            worst = 0.0
+            for key, tensor in state_dict.items():
+                # fp16 and bf16 keep weights in the new dtype, int8 restores the original
+                dtype = {"fp16": torch.float16, "bf16": torch.bfloat16}.get(precision) if tensor.dim() >= 2 else None
+                worst = max(worst, error(tensor, converted[key], dtype))
+            checks = [("memory", worst)]
+
+            if precision == "int8":
+                packed = lora_precision.pack_state_dict(state_dict, precision)
+                checks.append(("float32_scales", 0.0 if all(
+                    v.dtype == torch.float32 for k, v in packed.items() if k.endswith(lora_precision.SCALE_SUFFIX))
+                    else float("inf")))
+                path = os.path.join(workdir, f"roundtrip_{source_dtype}.safetensors")
+                comfy_stubs.write_safetensors(path, {
+                    key: (SAFETENSORS_DTYPES[str(t.dtype).replace("torch.", "")], list(t.shape), to_bytes(t))
+                    for key, t in packed.items()
+                }, lora_precision.packed_metadata(state_dict, precision))
+                for lazy in (False, True):
+                    lora_cache.get_lora_cache().clear()
+                    loaded = lora_cache.load_lora_state_dict(path, lazy=lazy)
+                    worst = max(error(t, loaded[k]) for k, t in state_dict.items())
+                    if set(loaded) != set(state_dict):
+                        worst = float("inf")
+                    checks.append(("lazy_file" if lazy else "file", worst))
+
+            for mode, worst in checks:
+                params = {"dtype": source_dtype, "precision": precision, "mode": mode}
+                rec.results.append({"name": "precision_roundtrip", "params": params, "max_rel_error": worst})
+                print(f"{'precision_roundtrip':<28} {json.dumps(params):<40} max rel error {worst:.2e}")
+                if worst > tolerance:
+                    print(f"FAIL: {precision} storage of a {source_dtype} LoRA is off by {worst:.2e} ({mode})")
+                    ok = False
+    return ok
+
+
+def bench_batch_to_list(rec, batch_sizes, image_size, repeat):
+    if not comfy_stubs.has_torch():
+        rec.skip("image_batch_to_list", "torch is not installed")
+        return
+    import torch
+    image_batch_to_list = comfy_stubs.import_module("image_batch_to_list")
+    node = image_batch_to_list.ImageBatchToImageList()
+
+    to_batch = image_batch_to_list.ImageListToImageBatch()
+
+    for batch_size in batch_sizes:
+        image = torch.rand(batch_size, image_size, image_size, 3)
+        for chunk_size in sorted({1, max(1, batch_size // 4)}):
+            timing = measure(lambda: node.doit(image, chunk_size, assert_zero_copy=True), repeat)
+            rec.add("image_batch_to_list", {"batch": batch_size, "size": image_size, "chunk": chunk_size}, timing)
+        pieces = node.doit(image)[0]
+        timing = measure(lambda: to_batch.doit(pieces), repeat)
+        rec.add("image_list_to_batch", {"batch": batch_size, "size": image_size}, timing)
+
+
+# Modules the package must not import when it is loaded. ComfyUI has them
+# loaded already, but pulling them in from module level makes the package
+# slow to import anywhere else and hides import time regressions.
+HEAVY_MODULES = ("torch", "PIL", "numpy", "aiohttp")
+
+IMPORT_SCRIPT = """
+import json, sys, time
+sys.path.insert(0, {bench_dir!r})
+import comfy_stubs
+comfy_stubs.install_stubs([])
+before = set(sys.modules)
+start = time.perf_counter()
+comfy_stubs.import_package()
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "modules": sorted(set(sys.modules) - before)}}))
+"""
+
+
+def bench_import(rec, repeat, budget_ms):
+    """Import the package in fresh interpreters, like python -X importtime.
+
+    Returns False if the median import time exceeds budget_ms or a heavy
+    module was imported.
+    """
+    script = IMPORT_SCRIPT.format(bench_dir=os.path.dirname(os.path.realpath(__file__)))
+    times = []
+    self_us = {}
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", script],
+                              capture_output=True, text=True, env={**os.environ, **ISOLATED_ENV})
+        if proc.returncode != 0:
+            rec.skip("package_import", proc.stderr.strip().splitlines()[-1])
+            return True
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        times.append(result["seconds"])
+        # "import time: self [us] | cumulative | imported package"
+        for line in proc.stderr.splitlines():
+            parts = line.split("|")
+            if len(parts) == 3 and parts[0].startswith("import time:") and parts[0].split(":")[1].strip().isdigit():
+                name = parts[2].strip()
+                if name.startswith(comfy_stubs.PACKAGE_NAME):
+                    self_us[name] = min(self_us.get(name, float("inf")), int(parts[0].split(":")[1]))
+
+    heavy = sorted(m for m in result["modules"] if m.split(".")[0] in HEAVY_MODULES)
+    timing = {"min_s": min(times), "median_s": statistics.median(times), "mean_s": statistics.mean(times),
+              "repeat": repeat}
+    slowest = sorted(self_us.items(), key=lambda item: -item[1])[:5]
+    rec.add("package_import", {}, timing, budget_ms=budget_ms, heavy_modules=heavy,
+            slowest_modules={name: us for name, us in slowest})
+    for name, us in slowest:
+        print(f"  {name:<48} self {us / 1000:8.3f} ms")
+
+    ok = True
+    if timing["median_s"] * 1000 > budget_ms:
+        print(f"  OVER BUDGET: median import time exceeds {budget_ms} ms")
+        ok = False
+    if heavy:
+        print(f"  OVER BUDGET: importing the package loads {', '.join(heavy)}")
+        ok = False
+    return ok
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=comfy_stubs.PACKAGE_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path, threshold):
+    """Print median ratios against a previous run. Returns the number of regressions."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    old = {(r["name"], json.dumps(r["params"], sort_keys=True)): r for r in baseline["results"] if "median_s" in r}
+    regressions = 0
+    print(f"\nCompared with {baseline_path} ({baseline['meta'].get('commit')}):")
+    for result in results:
+        key = (result["name"], json.dumps(result["params"], sort_keys=True))
+        if "median_s" not in result or key not in old:
+            continue
+        ratio = result["median_s"] / old[key]["median_s"]
+        flag = ""
+        if ratio > threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{result['name']:<28} {key[1]:<40} x{ratio:6.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,1000,10000",
+                        help="comma separated LoRA library sizes, up to 50000 files")
+    parser.add_argument("--batch-sizes", default="1,8,32", help="comma separated image batch sizes")
+    parser.add_argument("--image-size", type=int, default=512)
+    parser.add_argument("--lora-files", type=int, default=4, help="number of full synthetic LoRAs to load")
+    parser.add_argument("--rank", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--workdir", help="where to create the synthetic libraries (default: a temp dir)")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of a previous run to compare against")
+    parser.add_argument("--threshold", type=float, default=1.2,
+                        help="median slowdown ratio reported as a regression")
+    parser.add_argument("--import-budget-ms", type=float, default=100.0,
+                        help="maximum median time to import the package")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    batch_sizes = [int(s) for s in args.batch_sizes.split(",") if s]
+    if any(size > 50000 or size < 1 for size in sizes):
+        parser.error("--sizes must be between 1 and 50000")
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="loras_loader_bench_")
+    os.environ.update(ISOLATED_ENV)
+    rec = Recorder()
+    import_ok = bench_import(rec, args.repeat, args.import_budget_ms)
+    try:
+        largest = os.path.join(workdir, f"tree_{max(sizes)}")
+        comfy_stubs.install_stubs([largest])
+        for size in sizes:
+            root = os.path.join(workdir, f"tree_{size}")
+            if not os.path.isdir(root):
+                comfy_stubs.make_lora_tree(root, size, real_files=min(args.lora_files, size), rank=args.rank)
+            lora_index = comfy_stubs.import_module("lora_index")
+            names = lora_index.LoraIndex(None).refresh([root])
+            bench_scan(rec, root, size, args.repeat)
+            bench_resolve(rec, root, names, args.repeat)
+
+        real_paths = [os.path.join(largest, n) for n in sorted(os.listdir(largest))
+                      if n.endswith(".safetensors")][:args.lora_files]
+        bench_load(rec, real_paths, args.repeat)
+        bench_apply(rec, largest, args.repeat)
+        bench_greyscale(rec, batch_sizes, args.image_size, args.repeat)
+        greyscale_ok = check_greyscale_pil(rec)
+        precision_ok = check_precision_roundtrip(rec, workdir)
+        bench_batch_to_list(rec, batch_sizes, args.image_size, args.repeat)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    try:
+        import torch
+        torch_version = torch.__version__
+    except ImportError:
+        torch_version = None
+    output = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "torch": torch_version,
+            "args": vars(args),
+        },
+        "results": rec.results,
+        "skipped": rec.skipped,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(output, f, indent=2)
+
+    status = 0 if import_ok and greyscale_ok and precision_ok else 1
+    if args.compare and compare(rec.results, args.compare, args.threshold):
+        status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""Stand-ins for the ComfyUI modules the nodes import, plus synthetic LoRA files.
+
+The stubs only implement what the nodes in this package call, so the loaders
+can be benchmarked without a ComfyUI install.
+"""
+import importlib.util
+import json
+import os
+import random
+import struct
+import sys
+import types
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+PACKAGE_NAME = "loras_loader"
+
+
+def has_torch():
+    return importlib.util.find_spec("torch") is not None
+
+
+def install_stubs(lora_dirs):
+    """Register folder_paths, comfy.utils and comfy.sd stubs in sys.modules."""
+    folder_paths = types.ModuleType("folder_paths")
+    folder_paths.get_folder_paths = lambda kind: list(lora_dirs) if kind == "loras" else []
+    folder_paths.get_filename_list = lambda kind: (
+        import_module("lora_index").get_lora_index().refresh(lora_dirs) if kind == "loras" else [])
+
+    comfy = types.ModuleType("comfy")
+    comfy.__path__ = []
+    comfy_utils = types.ModuleType("comfy.utils")
+    comfy_sd = types.ModuleType("comfy.sd")
+    comfy_utils.load_torch_file = load_torch_file
+    comfy_sd.load_lora_for_models = load_lora_for_models
+    comfy.utils = comfy_utils
+    comfy.sd = comfy_sd
+    sys.modules.update({
+        "folder_paths": folder_paths,
+        "comfy": comfy,
+        "comfy.utils": comfy_utils,
+        "comfy.sd": comfy_sd,
+    })
+
+
+def import_module(name):
+    """Import a module of this repository, with the stubs already installed.
+
+    The package's __init__ is not executed, so modules that don't need torch
+    can be benchmarked without it.
+    """
+    if PACKAGE_NAME not in sys.modules:
+        spec = importlib.util.spec_from_file_location(
+            PACKAGE_NAME, os.path.join(PACKAGE_DIR, "__init__.py"), submodule_search_locations=[PACKAGE_DIR])
+        sys.modules[PACKAGE_NAME] = importlib.util.module_from_spec(spec)
+    return importlib.import_module(f"{PACKAGE_NAME}.{name}")
+
+
+def import_package():
+    """Import the whole package and run its __init__, the way ComfyUI loads it."""
+    spec = importlib.util.spec_from_file_location(
+        PACKAGE_NAME, os.path.join(PACKAGE_DIR, "__init__.py"), submodule_search_locations=[PACKAGE_DIR])
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[PACKAGE_NAME] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_torch_file(path, safe_load=False, device=None):
+    """comfy.utils.load_torch_file for safetensors files: read everything eagerly."""
+    lazy = import_module("lazy_safetensors")
+    mapping = lazy.LazySafetensors(path)
+    if has_torch():
+        return {k: v.clone() for k, v in mapping.items()}
+    # Without torch, return raw bytes per tensor so loads still do the I/O
+    header, data_offset = lazy.read_safetensors_header(path)
+    header.pop("__metadata__", None)
+    with open(path, "rb") as f:
+        f.seek(data_offset)
+        data = f.read()
+    return {k: memoryview(data)[v["data_offsets"][0]:v["data_offsets"][1]] for k, v in header.items()}
+
+
+def load_lora_for_models(model, clip, lora_sd, strength_model, strength_clip):
+    """comfy.sd.load_lora_for_models stand-in that touches every tensor once."""
+    total = 0
+    for value in lora_sd.values():
+        total += len(value) if isinstance(value, memoryview) else value.numel()
+    return (model, clip)
+
+
+def write_safetensors(path, tensors, metadata=None):
+    """Write a safetensors file. tensors maps names to (dtype, shape, bytes)."""
+    header = {}
+    offset = 0
+    for name, (dtype, shape, data) in tensors.items():
+        header[name] = {"dtype": dtype, "shape": shape, "data_offsets": [offset, offset + len(data)]}
+        offset += len(data)
+    if metadata:
+        header["__metadata__"] = metadata
+    raw = json.dumps(header).encode("utf-8")
+    raw += b" " * (-len(raw) % 8)
+    with open(path, "wb") as f:
+        f.write(struct.pack("<Q", len(raw)))
+        f.write(raw)
+        for _, _, data in tensors.values():
+            f.write(data)
+
+
+def make_lora(path, layers=64, dim=320, rank=16, clip_layers=16, seed=0, metadata=None):
+    """Write a synthetic fp16 LoRA with kohya-style UNet and text encoder keys."""
+    rng = random.Random(seed)
+    tensors = {}
+
+    def add(prefix, index):
+        base = f"{prefix}_{index}"
+        tensors[f"{base}.lora_up.weight"] = ("F16", [dim, rank], rng.randbytes(dim * rank * 2))
+        tensors[f"{base}.lora_down.weight"] = ("F16", [rank, dim], rng.randbytes(dim * rank * 2))
+        tensors[f"{base}.alpha"] = ("F16", [], struct.pack("<e", float(rank)))
+
+    for i in range(layers):
+        add("lora_unet_down_blocks_attn", i)
+    for i in range(clip_layers):
+        add("lora_te_text_model_encoder_layers", i)
+    write_safetensors(path, tensors, metadata)
+
+
+def make_lora_tree(root, files, per_dir=500, real_files=4, **lora_kwargs):
+    """Create files LoRAs under root, spread over subdirectories of per_dir files.
+
+    The first real_files entries are full synthetic LoRAs, the rest are tiny
+    valid files that only matter for directory scans. Returns the names.
+    """
+    names = []
+    for i in range(files):
+        subdir = f"group_{i // per_dir:04d}" if i >= per_dir else ""
+        name = os.path.join(subdir, f"lora_{i:06d}.safetensors") if subdir else f"lora_{i:06d}.safetensors"
+        path = os.path.join(root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if i < real_files:
+            make_lora(path, seed=i, metadata={"ss_output_name": f"lora_{i:06d}"}, **lora_kwargs)
+        else:
+            write_safetensors(path, {})
+        names.append(name)
+    return names
@@ -1,4 +1,24 @@
-from PIL import Image
+# PIL's convert("L") uses ITU-R 601-2 luma weights in 16 bit fixed point:
+# L = (R * 19595 + G * 38470 + B * 7471 + 0x8000) >> 16
+LUMA_WEIGHTS = (19595.0, 38470.0, 7471.0)
+
+
+def greyscale_luma(image):
+    """Luminance of a (..., C) image in [0,1], matching PIL's convert("L").
+
+    The image is quantized to uint8 levels the same way tensor_to_pil used to
+    (scale by 255 and truncate), then the fixed point luma formula is applied.
+    Every intermediate value is an integer below 2**24, so float32 arithmetic is
+    exact on any device and the result equals PIL's output bit for bit.
+    """
+    import torch
+
+    levels = (image * 255.0).clamp_(0, 255).floor_()
+    if levels.shape[-1] == 1:
+        return levels[..., 0] / 255.0
+    r, g, b = levels[..., 0], levels[..., 1], levels[..., 2]
+    luma = r * LUMA_WEIGHTS[0] + g * LUMA_WEIGHTS[1] + b * LUMA_WEIGHTS[2] + 32768.0
+    return torch.floor_(luma / 65536.0) / 255.0
 
 
 class ConvertGreyscaleNode:
@@ -7,54 +27,40 @@ class ConvertGreyscaleNode:
         return {
             "required": {
                 "image": ("IMAGE",),
+            },
+            "optional": {
+                # Number of images converted at once, 0 converts the whole batch
+                "chunk_size": ("INT", {"default": 0, "min": 0, "max": 4096, "step": 1}),
+                # Output a 1-channel image instead of three identical channels
+                "single_channel": ("BOOLEAN", {"default": False}),
             }
         }
 
     RETURN_TYPES = ("IMAGE",)
     FUNCTION = "convert_greyscale"
     CATEGORY = "image"
-    
-    def convert_greyscale(self, image):
-        # Use the same approach as in ComfyUI-LogicUtils/io_node.py:
-        # image.convert("L") then convert back to RGB.
-        import torch
-        import numpy as np
-        from PIL import Image
 
-        def tensor_to_pil(img_tensor):
-            # img_tensor: (H, W, C) in [0,1]
-            np_img = (img_tensor.detach().cpu().numpy() * 255.0).clip(0, 255).astype(np.uint8)
-            if np_img.shape[-1] == 1:
-                np_img = np.repeat(np_img, 3, axis=-1)
-            return Image.fromarray(np_img)
+    def convert_greyscale(self, image, chunk_size=0, single_channel=False):
+        import torch
 
-        def pil_to_tensor(img_pil):
-            np_img = np.array(img_pil).astype(np.float32) / 255.0
-            if np_img.ndim == 2:
-                np_img = np.stack([np_img] * 3, axis=-1)
-            return torch.from_numpy(np_img)
+        # Same result as ComfyUI-LogicUtils/io_node.py's image.convert("L") then
+        # convert("RGB"), computed on the whole batch on its current device.
+        if not isinstance(image, torch.Tensor):
+            raise RuntimeError("Expected IMAGE tensor")
+        if image.dim() == 3:
+            image = image.unsqueeze(0)
 
-        # Normalize to a list of images (batch)
-        batched = False
-        if isinstance(image, torch.Tensor) and image.dim() == 4:
-            batched = True
-            imgs = [image[i] for i in range(image.shape[0])]
-        else:
-            imgs = [image.squeeze(0) if isinstance(image, torch.Tensor) and image.dim() == 3 else image]
+        batch_size, height, width, _ = image.shape
+        channels = 1 if single_channel else 3
+        result = torch.empty((batch_size, height, width, channels), dtype=torch.float32, device=image.device)
 
-        out_imgs = []
-        for img in imgs:
-            if not isinstance(img, torch.Tensor):
-                raise RuntimeError("Expected IMAGE tensor")
-            pil_img = tensor_to_pil(img)
-            grey = pil_img.convert("L")
-            grey_rgb = grey.convert("RGB")
-            out_tensor = pil_to_tensor(grey_rgb)
-            # back to (1, H, W, C)
-            out_tensor = out_tensor.unsqueeze(0)
-            out_imgs.append(out_tensor)
+        # Chunking bounds the temporaries to chunk_size images, so large batches
+        # don't need twice the memory of the input
+        step = chunk_size if chunk_size > 0 else max(batch_size, 1)
+        for start in range(0, batch_size, step):
+            chunk = image[start:start + step].to(torch.float32)
+            result[start:start + step] = greyscale_luma(chunk).unsqueeze(-1)
 
-        result = torch.cat(out_imgs, dim=0) if batched else out_imgs[0]
         return (result,)
 
 
@@ -65,5 +71,3 @@ NODE_CLASS_MAPPINGS = {
 NODE_DISPLAY_NAME_MAPPINGS = {
     "ConvertGreyscaleNode": "Convert Greyscale",
 }
-
-
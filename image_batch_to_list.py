@@ -1,24 +1,77 @@
 class ImageBatchToImageList:
     @classmethod
     def INPUT_TYPES(cls):
-        return {"required": {"image": ("IMAGE",), }}
+        return {
+            "required": {
+                "image": ("IMAGE",),
+            },
+            "optional": {
+                # Frames per list item. Larger chunks mean fewer downstream executions
+                "chunk_size": ("INT", {"default": 1, "min": 1, "max": 65536, "step": 1}),
+                # Raise an error if any item isn't a view of the input batch
+                "assert_zero_copy": ("BOOLEAN", {"default": False}),
+            }
+        }
 
     RETURN_TYPES = ("IMAGE",)
     OUTPUT_IS_LIST = (True,)
     FUNCTION = "doit"
     CATEGORY = "images"
 
-    def doit(self, image):
-        images = [image[i:i + 1, ...] for i in range(image.shape[0])]
+    def doit(self, image, chunk_size=1, assert_zero_copy=False):
+        # Slices are views sharing the input's memory, nothing is copied
+        images = [image[i:i + chunk_size, ...] for i in range(0, image.shape[0], chunk_size)]
+        if assert_zero_copy:
+            frame_bytes = image.stride(0) * image.element_size()
+            for n, piece in enumerate(images):
+                if piece.data_ptr() != image.data_ptr() + n * chunk_size * frame_bytes:
+                    raise RuntimeError(f"Image list item {n} is a copy, not a view of the input batch")
         return (images,)
 
 
+class ImageListToImageBatch:
+    """Joins an image list into one batch, allocating the output once."""
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {"required": {"images": ("IMAGE",), }}
+
+    INPUT_IS_LIST = True
+    RETURN_TYPES = ("IMAGE",)
+    FUNCTION = "doit"
+    CATEGORY = "images"
+
+    def doit(self, images):
+        import torch
+
+        if len(images) == 0:
+            raise RuntimeError("Expected at least one IMAGE")
+        if len(images) == 1:
+            return (images[0],)
+
+        first = images[0]
+        _, height, width, channels = first.shape
+        total = sum(piece.shape[0] for piece in images)
+        result = torch.empty((total, height, width, channels), dtype=first.dtype, device=first.device)
+
+        start = 0
+        for piece in images:
+            if piece.shape[1:] != first.shape[1:]:
+                # Same as ComfyUI's batching nodes: resize to the first image
+                import comfy.utils
+                piece = comfy.utils.common_upscale(
+                    piece.movedim(-1, 1), width, height, "bilinear", "center").movedim(1, -1)
+            result[start:start + piece.shape[0]].copy_(piece)
+            start += piece.shape[0]
+        return (result,)
+
+
 NODE_CLASS_MAPPINGS = {
     "ImageBatchToImageList": ImageBatchToImageList,
+    "ImageListToImageBatchPreallocated": ImageListToImageBatch,
 }
 
 NODE_DISPLAY_NAME_MAPPINGS = {
     "ImageBatchToImageList": "Image Batch To Image List",
+    "ImageListToImageBatchPreallocated": "Image List To Image Batch (Preallocated)",
 }
-
-
@@ -0,0 +1,115 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Log level of the package logger, e.g. DEBUG to see every selection and load.
+# Warnings and errors are shown by default.
+logger = logging.getLogger("loras_loader")
+_log_level = os.environ.get("LORAS_LOADER_LOG_LEVEL", "").strip().upper() or "WARNING"
+try:
+    logger.setLevel(int(_log_level) if _log_level.isdigit() else _log_level)
+except ValueError:
+    logger.setLevel(logging.WARNING)
+    logger.warning("Unknown LORAS_LOADER_LOG_LEVEL %r, using WARNING", _log_level)
+
+_lock = threading.Lock()
+_spans = {}  # node -> stage -> {"count", "total_s", "min_s", "max_s"}
+_counters = {}  # node -> name -> int
+
+
+def record_span(node, stage, seconds):
+    with _lock:
+        span = _spans.setdefault(node, {}).get(stage)
+        if span is None:
+            _spans[node][stage] = {"count": 1, "total_s": seconds, "min_s": seconds, "max_s": seconds}
+            return
+        span["count"] += 1
+        span["total_s"] += seconds
+        span["min_s"] = min(span["min_s"], seconds)
+        span["max_s"] = max(span["max_s"], seconds)
+
+
+@contextmanager
+def timed(node, stage):
+    """Record how long the body takes as a stage of node (scan, resolve, read, apply...)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        record_span(node, stage, seconds)
+        logger.debug("%s %s took %.3f ms", node, stage, seconds * 1000)
+
+
+def count(node, name, n=1):
+    with _lock:
+        counters = _counters.setdefault(node, {})
+        counters[name] = counters.get(name, 0) + n
+
+
+def _hit_rate(hits, misses):
+    return hits / (hits + misses) if hits + misses else None
+
+
+def get_stats():
+    """Aggregate timing spans, counters and cache statistics for every node."""
+    with _lock:
+        nodes = {}
+        for node in set(_spans) | set(_counters):
+            stages = {}
+            for stage, span in _spans.get(node, {}).items():
+                stages[stage] = dict(span, mean_s=span["total_s"] / span["count"])
+            nodes[node] = {"stages": stages, "counters": dict(_counters.get(node, {}))}
+
+    from .lora_cache import get_lora_cache
+    from .lora_prefetch import get_lora_prefetcher
+    from .lora_preload import get_preload_status
+    from .lora_result_cache import get_result_cache
+    cache = get_lora_cache().stats()
+    cache["hit_rate"] = _hit_rate(cache["hits"], cache["misses"])
+    results = get_result_cache().stats()
+    results["hit_rate"] = _hit_rate(results["hits"], results["misses"])
+    return {
+        "nodes": nodes,
+        "state_dict_cache": cache,
+        "result_cache": results,
+        "prefetch": get_lora_prefetcher().stats(),
+        "preload": get_preload_status(),
+    }
+
+
+def reset_stats():
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+
+
+def register_stats_route():
+    """Serve get_stats() at /loras_loader/stats and the duplicate LoRA report at
+    /loras_loader/duplicates when running inside ComfyUI."""
+    try:
+        # server is only importable inside ComfyUI, check it before paying for aiohttp
+        from server import PromptServer
+        from aiohttp import web
+    except ImportError:
+        return False
+    if getattr(PromptServer, "instance", None) is None:
+        return False
+
+    @PromptServer.instance.routes.get("/loras_loader/stats")
+    async def loras_loader_stats(request):
+        return web.json_response(get_stats())
+
+    @PromptServer.instance.routes.get("/loras_loader/duplicates")
+    async def loras_loader_duplicates(request):
+        import asyncio
+        import folder_paths
+        from .lora_fingerprint import find_duplicate_loras
+        # Fingerprinting reads every new file, keep it off the server's event loop
+        groups = await asyncio.get_running_loop().run_in_executor(
+            None, find_duplicate_loras, folder_paths.get_folder_paths("loras"))
+        return web.json_response({"groups": groups})
+
+    return True
@@ -0,0 +1,101 @@
+import json
+import mmap
+import struct
+from collections.abc import Mapping
+
+# Key prefixes used by text encoder LoRA weights in the kohya, diffusers and
+# ComfyUI naming schemes
+CLIP_KEY_PREFIXES = (
+    "lora_te_", "lora_te1_", "lora_te2_", "lora_te3_", "lora_prior_te_",
+    "text_encoder.", "text_encoder_2.", "text_encoders.",
+)
+
+# Upper bound on the JSON header, the format itself caps it at 100MB
+MAX_HEADER_SIZE = 100 * 1024 * 1024
+
+_DTYPES = {
+    "F64": "float64",
+    "F32": "float32",
+    "F16": "float16",
+    "BF16": "bfloat16",
+    "I64": "int64",
+    "I32": "int32",
+    "I16": "int16",
+    "I8": "int8",
+    "U8": "uint8",
+    "BOOL": "bool",
+    "F8_E4M3": "float8_e4m3fn",
+    "F8_E5M2": "float8_e5m2",
+}
+
+
+def read_safetensors_header(path):
+    """Read the JSON header of a safetensors file without touching tensor data.
+
+    Returns (header, data_offset) where header maps tensor names to their
+    dtype/shape/data_offsets entries and data_offset is where tensor data starts.
+    """
+    with open(path, "rb") as f:
+        raw = f.read(8)
+        if len(raw) != 8:
+            raise ValueError(f"{path} is too short to be a safetensors file")
+        (header_size,) = struct.unpack("<Q", raw)
+        if header_size > MAX_HEADER_SIZE:
+            raise ValueError(f"{path} has an invalid safetensors header size ({header_size})")
+        header = json.loads(f.read(header_size))
+    return header, 8 + header_size
+
+
+def is_clip_key(key):
+    return key.startswith(CLIP_KEY_PREFIXES)
+
+
+class LazySafetensors(Mapping):
+    """Read-only mapping over a memory-mapped safetensors file.
+
+    Tensors are created on access as views of the mapped file, so only the
+    pages of tensors that are actually used get read from disk.
+    """
+
+    def __init__(self, path, skip_clip=False):
+        header, self._data_offset = read_safetensors_header(path)
+        self.path = path
+        self.metadata = header.pop("__metadata__", None) or {}
+        if skip_clip:
+            header = {k: v for k, v in header.items() if not is_clip_key(k)}
+        self._header = header
+        with open(path, "rb") as f:
+            # ACCESS_COPY gives writable (copy-on-write) pages so torch doesn't
+            # warn about non-writable buffers, the file itself is never modified
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY) if header else None
+
+    @property
+    def nbytes(self):
+        return sum(end - start for start, end in (v["data_offsets"] for v in self._header.values()))
+
+    def __getitem__(self, key):
+        import torch
+
+        info = self._header[key]
+        dtype = getattr(torch, _DTYPES[info["dtype"]])
+        start, end = info["data_offsets"]
+        shape = info["shape"]
+        if end == start:
+            return torch.empty(shape, dtype=dtype)
+        itemsize = torch.empty(0, dtype=dtype).element_size()
+        tensor = torch.frombuffer(self._mmap, dtype=dtype, count=(end - start) // itemsize,
+                                  offset=self._data_offset + start)
+        return tensor.reshape(shape)
+
+    def __iter__(self):
+        return iter(self._header)
+
+    def __len__(self):
+        return len(self._header)
+
+    def __contains__(self, key):
+        return key in self._header
+
+
+def load_safetensors_lazy(path, skip_clip=False):
+    return LazySafetensors(path, skip_clip=skip_clip)
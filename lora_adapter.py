@@ -1,4 +1,14 @@
 import folder_paths
+from .instrumentation import logger, timed, count
+from .lora_index import get_lora_index
+
+class _LoraNamesReturnType:
+    """RETURN_TYPES of LoRAStringAdapter, listing the LoRAs when first read
+    instead of when the module is imported."""
+
+    def __get__(self, instance, owner):
+        return (folder_paths.get_filename_list("loras"),)
+
 
 class LoRAStringAdapter:
     """Converts a string to a compatible LoRA input for the standard LoRA loader."""
@@ -11,24 +21,41 @@ class LoRAStringAdapter:
             }
         }
 
-    RETURN_TYPES = (folder_paths.get_filename_list("loras"),)
+    RETURN_TYPES = _LoraNamesReturnType()
     RETURN_NAMES = ("lora_name",)
     FUNCTION = "adapt_lora_name"
     CATEGORY = "utils"
 
     def adapt_lora_name(self, lora_name_string):
-        available_loras = folder_paths.get_filename_list("loras")
+        count("LoRAStringAdapter", "executions")
+        # The shared index only rescans directories that changed since the last call
+        index = get_lora_index()
+        with timed("LoRAStringAdapter", "scan"):
+            available_loras = index.refresh(folder_paths.get_folder_paths("loras"))
         
         # If the string is empty or None, return a default
         if not lora_name_string:
             return (available_loras[0] if available_loras else "",)
             
-        # If the requested LoRA exists in the list, return it
-        if lora_name_string in available_loras:
-            return (lora_name_string,)
+        # If the requested LoRA exists in the list, return it. Case, extension and
+        # subdirectory differences are tolerated.
+        with timed("LoRAStringAdapter", "resolve"):
+            lora_name = index.lookup(lora_name_string)
+        if lora_name is not None:
+            return (lora_name,)
+            
+        # Next, try the closest name, so a typo doesn't silently pick another LoRA
+        with timed("LoRAStringAdapter", "fuzzy"):
+            match = index.fuzzy_lookup(lora_name_string)
+        if match is not None:
+            count("LoRAStringAdapter", "fuzzy_matches")
+            logger.warning("LoRA '%s' not found in available LoRAs. Using closest match '%s' (similarity %.2f).",
+                           lora_name_string, match[0], match[1])
+            return (match[0],)
             
         # Otherwise, provide a warning and return the first available LoRA
-        print(f"Warning: LoRA '{lora_name_string}' not found in available LoRAs. Using first available LoRA.")
+        count("LoRAStringAdapter", "not_found")
+        logger.warning("LoRA '%s' not found in available LoRAs. Using first available LoRA.", lora_name_string)
         return (available_loras[0] if available_loras else "",)
 
 # Add the node to ComfyUI
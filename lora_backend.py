@@ -0,0 +1,225 @@
+import importlib
+import os
+import threading
+
+from .lora_cache import load_lora_state_dict, lora_state_dict_variant
+from .lora_fingerprint import get_lora_fingerprints
+from .lora_result_cache import get_result_cache, patched_result_nbytes
+from .instrumentation import logger, timed, count
+
+# Modules that may provide the reference LoraLoader node, depending on the
+# ComfyUI version
+LORA_LOADER_MODULES = ["comfy_extras.nodes_lora", "nodes"]
+LORA_LOADER_PARAMS = ("model", "clip", "lora_name", "strength_model", "strength_clip")
+# comfy.lora functions needed to match LoRA keys ourselves
+KEY_MAP_FUNCTIONS = ("load_lora", "model_lora_keys_unet", "model_lora_keys_clip")
+
+
+class LoraBackend:
+    """A resolved way of applying a LoRA to a MODEL/CLIP pair.
+
+    apply is bound once, with the argument order already fixed, so callers pay
+    no probing cost per execution. Backends that take a state dict load it
+    through the shared cache; the reference LoraLoader loads by name itself.
+    Keyed backends also get the identity of the LoRA's contents, to reuse its
+    key matching.
+    """
+
+    def __init__(self, name, reason, apply, uses_state_dict=True, keyed=False):
+        self.name = name
+        self.reason = reason
+        self._apply = apply
+        self.uses_state_dict = uses_state_dict
+        self.keyed = keyed
+
+    def apply(self, model, clip, lora_name, lora_path, strength_model, strength_clip, lazy=False,
+              precision="default", node="LoRA"):
+        if not self.uses_state_dict:
+            import folder_paths
+            # LoraLoader loads by name, which must lead to the same file
+            full_path = folder_paths.get_full_path("loras", lora_name)
+            if full_path is None or os.path.realpath(full_path) != os.path.realpath(lora_path):
+                raise FileNotFoundError(f"The LoraLoader backend can't load {lora_path} as '{lora_name}'")
+            with timed(node, "apply"):
+                return self._apply(model, clip, lora_name, strength_model, strength_clip)
+        with timed(node, "read"):
+            lora_sd = load_lora_state_dict(lora_path, lazy=lazy, include_clip=clip is not None, precision=precision,
+                                           node=node)
+        with timed(node, "apply"):
+            if self.keyed:
+                return self._apply(model, clip, lora_sd, strength_model, strength_clip,
+                                   lora_id=lora_content_id(lora_path, lazy, clip is not None), name=lora_name)
+            return self._apply(model, clip, lora_sd, strength_model, strength_clip)
+
+
+def lora_content_id(lora_path, lazy=False, include_clip=True):
+    """Identity of a loaded LoRA's keys: its content fingerprint and load variant.
+
+    None if the file can't be fingerprinted.
+    """
+    try:
+        fingerprint = get_lora_fingerprints().get(os.path.realpath(lora_path))
+    except OSError:
+        return None
+    return (fingerprint, lora_state_dict_variant(lora_path, lazy, include_clip))
+
+
+def _per_part(fn):
+    def apply(model, clip, lora_sd, strength_model, strength_clip):
+        model_out = fn(model, lora_sd, strength_model) if model is not None else model
+        clip_out = fn(clip, lora_sd, strength_clip) if clip is not None else clip
+        return (model_out, clip_out)
+    return apply
+
+
+def _bind_lora_loader(loader_cls):
+    import inspect
+
+    loader = loader_cls()
+    params = [p for p in inspect.signature(loader.load_lora).parameters]
+    if all(p in LORA_LOADER_PARAMS for p in params):
+        # Pass by name so any parameter order works
+        def apply(model, clip, lora_name, strength_model, strength_clip):
+            values = dict(zip(LORA_LOADER_PARAMS, (model, clip, lora_name, strength_model, strength_clip)))
+            return loader.load_lora(**{p: values[p] for p in params})
+        return apply, f"parameters {params}"
+
+    # Unknown parameter names, fall back to the standard order trimmed to the arity
+    arity = len(params)
+
+    def apply(model, clip, lora_name, strength_model, strength_clip):
+        return loader.load_lora(*[model, clip, lora_name, strength_model, strength_clip][:arity])
+    return apply, f"{arity} positional parameters"
+
+
+def probe_lora_backend():
+    """Find the best available LoRA backend. Returns (backend, notes)."""
+    notes = []
+    try:
+        import comfy.sd as sd
+    except Exception as e:
+        sd = None
+        notes.append(f"comfy.sd unavailable: {str(e)}")
+
+    if sd is not None and hasattr(sd, "load_lora_for_models"):
+        try:
+            import comfy.lora as comfy_lora
+        except Exception as e:
+            comfy_lora = None
+            notes.append(f"comfy.lora unavailable: {str(e)}")
+        if comfy_lora is not None and all(hasattr(comfy_lora, fn) for fn in KEY_MAP_FUNCTIONS):
+            from .lora_keymap import apply_with_key_maps
+            return LoraBackend("key_maps", "comfy.lora key matching is available, cached per architecture",
+                               apply_with_key_maps, keyed=True), notes
+        if comfy_lora is not None:
+            notes.append("comfy.lora lacks " + ", ".join(fn for fn in KEY_MAP_FUNCTIONS if not hasattr(comfy_lora, fn)))
+
+    if sd is not None:
+        if hasattr(sd, "load_lora_for_models"):
+            return LoraBackend("load_lora_for_models", "comfy.sd.load_lora_for_models is available",
+                               sd.load_lora_for_models), notes
+        notes.append("comfy.sd has no load_lora_for_models")
+        if hasattr(sd, "apply_weighted_lora"):
+            return LoraBackend("apply_weighted_lora", "comfy.sd.apply_weighted_lora is available",
+                               _per_part(sd.apply_weighted_lora)), notes
+        notes.append("comfy.sd has no apply_weighted_lora")
+        if hasattr(sd, "apply_lora"):
+            return LoraBackend("apply_lora", "comfy.sd.apply_lora is available",
+                               _per_part(sd.apply_lora)), notes
+        notes.append("comfy.sd has no apply_lora")
+
+    for module_name in LORA_LOADER_MODULES:
+        try:
+            module = importlib.import_module(module_name)
+        except Exception as e:
+            notes.append(f"{module_name} unavailable: {str(e)}")
+            continue
+        if not hasattr(module, "LoraLoader"):
+            notes.append(f"{module_name} has no LoraLoader")
+            continue
+        try:
+            apply, detail = _bind_lora_loader(module.LoraLoader)
+        except Exception as e:
+            notes.append(f"{module_name}.LoraLoader unusable: {str(e)}")
+            continue
+        return LoraBackend("LoraLoader", f"{module_name}.LoraLoader with {detail}", apply,
+                           uses_state_dict=False), notes
+
+    return None, notes
+
+
+_backend = None
+_notes = []
+_probed = False
+_backend_lock = threading.Lock()
+
+
+def get_lora_backend():
+    """Return the LoRA backend, probing for it on first use. None if unavailable."""
+    global _backend, _notes, _probed
+    if _probed:
+        return _backend
+    with _backend_lock:
+        if not _probed:
+            _backend, _notes = probe_lora_backend()
+            _probed = True
+            if _backend is None:
+                logger.error("Could not find a way to apply LoRAs in this ComfyUI installation")
+            else:
+                logger.info("Using LoRA backend %s (%s)", _backend.name, _backend.reason)
+    return _backend
+
+
+def reset_lora_backend():
+    """Forget the probed backend so the next use probes again."""
+    global _backend, _notes, _probed
+    with _backend_lock:
+        _backend = None
+        _notes = []
+        _probed = False
+
+
+def describe_lora_backend():
+    """Report which backend was picked and why."""
+    backend = get_lora_backend()
+    return {
+        "backend": backend.name if backend else None,
+        "reason": backend.reason if backend else "no usable backend found",
+        "uses_state_dict": backend.uses_state_dict if backend else False,
+        "rejected": list(_notes),
+    }
+
+
+def apply_lora(model, clip, lora_name, lora_path, strength_model, strength_clip, lazy=False, precision="default",
+               node="LoRA"):
+    """Apply a LoRA with the probed backend, returning (model, clip).
+
+    Results are cached per base model, LoRA content and strengths, so applying
+    a combination again returns the earlier patched objects without reading or
+    patching. Read and apply times and result cache hits are recorded under node.
+    """
+    backend = get_lora_backend()
+    if backend is None:
+        logger.warning("No LoRA backend available, returning model without changes")
+        return (model, clip)
+
+    results = get_result_cache()
+    key = None
+    if results.max_entries > 0:
+        try:
+            fingerprint = get_lora_fingerprints().get(os.path.realpath(lora_path))
+        except OSError:
+            fingerprint = None
+        if fingerprint is not None:
+            key = results.make_key(model, clip, fingerprint, strength_model, strength_clip, precision)
+            cached = results.get(key)
+            if cached is not None:
+                count(node, "result_hits")
+                return cached
+            count(node, "result_misses")
+
+    result = backend.apply(model, clip, lora_name, lora_path, strength_model, strength_clip, lazy=lazy,
+                           precision=precision, node=node)
+    if key is not None:
+        results.put(key, model, clip, tuple(result), patched_result_nbytes(lora_path))
+    return result
@@ -0,0 +1,232 @@
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import MutableMapping
+
+from .lora_fingerprint import get_lora_fingerprints
+
+# RAM budget for cached LoRA state dicts, in megabytes. Set
+# LORAS_LOADER_CACHE_MB=0 to disable caching.
+DEFAULT_CACHE_MB = 1024
+
+
+def _load_torch_file(path):
+    import comfy.utils
+    return comfy.utils.load_torch_file(path)
+
+
+def state_dict_nbytes(state_dict):
+    """Approximate memory footprint of a state dict of tensors."""
+    if hasattr(state_dict, "nbytes"):
+        # Lazy mappings know their size without materializing tensors
+        return state_dict.nbytes
+    total = 0
+    for value in state_dict.values():
+        if hasattr(value, "nbytes"):
+            total += value.nbytes
+        elif hasattr(value, "numel") and hasattr(value, "element_size"):
+            total += value.numel() * value.element_size()
+    return total
+
+
+class StateDictView(MutableMapping):
+    """Private, writable view of a cached state dict.
+
+    ComfyUI's LoRA format conversion renames keys in place. Writes and deletes
+    go to this view only, so the cached entry is never modified and values
+    of lazy or quantized entries are still produced on access.
+    """
+
+    def __init__(self, state_dict):
+        self._state_dict = state_dict
+        self._overrides = {}
+        self._deleted = set()
+
+    def __getitem__(self, key):
+        if key in self._overrides:
+            return self._overrides[key]
+        if key in self._deleted:
+            raise KeyError(key)
+        return self._state_dict[key]
+
+    def __setitem__(self, key, value):
+        self._overrides[key] = value
+        self._deleted.discard(key)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self._overrides.pop(key, None)
+        if key in self._state_dict:
+            self._deleted.add(key)
+
+    def __iter__(self):
+        for key in self._state_dict:
+            if key not in self._deleted and key not in self._overrides:
+                yield key
+        yield from self._overrides
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __contains__(self, key):
+        return key in self._overrides or (key not in self._deleted and key in self._state_dict)
+
+    def copy(self):
+        return dict(self.items())
+
+
+class LoraStateDictCache:
+    """Process-wide LRU cache of loaded LoRA state dicts.
+
+    Entries are keyed by the content fingerprint of the file, so identical
+    files under different names share one entry and a file replaced on disk is
+    loaded again. Cached state dicts are shared between callers and must not be
+    modified in place; load_lora_state_dict hands out a StateDictView of them.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (state_dict, nbytes)
+        self._loading = {}  # key -> threading.Event
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(path, variant=None):
+        return (get_lora_fingerprints().get(os.path.realpath(path)), variant)
+
+    def load(self, path, loader=None, variant=None):
+        """Return the state dict for path, loading it with loader on a miss.
+
+        variant distinguishes differently loaded copies of the same file.
+        """
+        return self.load_with_status(path, loader, variant)[0]
+
+    def load_with_status(self, path, loader=None, variant=None):
+        """Like load, but returns (state_dict, hit)."""
+        loader = loader or _load_torch_file
+        key = self.make_key(path, variant)
+
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0], True
+                pending = self._loading.get(key)
+                if pending is None:
+                    self.misses += 1
+                    pending = self._loading[key] = threading.Event()
+                    break
+            # Another thread is already loading this file, wait for it
+            pending.wait()
+
+        try:
+            state_dict = loader(path)
+            self._insert(key, state_dict)
+            return state_dict, False
+        finally:
+            with self._lock:
+                del self._loading[key]
+            pending.set()
+
+    def contains(self, path, variant=None):
+        try:
+            key = self.make_key(path, variant)
+        except OSError:
+            return False
+        with self._lock:
+            return key in self._entries
+
+    def _insert(self, key, state_dict):
+        nbytes = state_dict_nbytes(state_dict)
+        with self._lock:
+            if nbytes > self.max_bytes:
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (state_dict, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes and self._entries:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+def lora_state_dict_variant(path, lazy=False, include_clip=True, precision="default"):
+    """Cache variant used by load_lora_state_dict for these options."""
+    precision = precision or "default"
+    if lazy and path.lower().endswith(".safetensors"):
+        return ("lazy", not include_clip) if precision == "default" else ("lazy", not include_clip, precision)
+    return None if precision == "default" else (precision,)
+
+
+def load_lora_state_dict(path, lazy=False, include_clip=True, precision="default", node=None):
+    """Load a LoRA through the shared cache.
+
+    With lazy=True, .safetensors files are memory-mapped and tensors are read on
+    access. Text encoder weights are dropped when include_clip is False. With a
+    precision other than "default", weights are kept in memory as fp16, bf16 or
+    int8 (see lora_precision). Cache hits and misses are counted under node, if given.
+    Returns a StateDictView, which callers may modify.
+    """
+    variant = lora_state_dict_variant(path, lazy, include_clip, precision)
+    if lazy and path.lower().endswith(".safetensors"):
+        from .lazy_safetensors import load_safetensors_lazy
+        skip_clip = not include_clip
+        read = lambda p: load_safetensors_lazy(p, skip_clip=skip_clip)  # noqa: E731
+    else:
+        read = _load_torch_file
+
+    def loader(p):
+        from .lora_precision import QuantizedStateDict, convert_state_dict, is_packed_int8, read_packed_dtype
+        state_dict = read(p)
+        if is_packed_int8(state_dict):
+            # Written by tools/convert_loras.py --precision int8
+            state_dict = QuantizedStateDict.from_packed(state_dict, read_packed_dtype(p))
+        return convert_state_dict(state_dict, precision)
+
+    state_dict, hit = get_lora_cache().load_with_status(path, loader=loader, variant=variant)
+    if node is not None:
+        from .instrumentation import count
+        count(node, "cache_hits" if hit else "cache_misses")
+    return StateDictView(state_dict)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_lora_cache():
+    """Return the state dict cache shared by all loader nodes."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            try:
+                max_mb = float(os.environ.get("LORAS_LOADER_CACHE_MB", DEFAULT_CACHE_MB))
+            except ValueError:
+                max_mb = DEFAULT_CACHE_MB
+            _cache = LoraStateDictCache(int(max_mb * 1024 * 1024))
+        return _cache
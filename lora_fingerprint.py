@@ -0,0 +1,131 @@
+import hashlib
+import os
+import sqlite3
+import struct
+import threading
+
+from .instrumentation import logger
+
+# Sampled fingerprints hash the safetensors header plus SAMPLE_BLOCKS evenly
+# spaced blocks of SAMPLE_BLOCK_SIZE bytes. Set LORAS_LOADER_FULL_HASH=1 to
+# hash whole files instead.
+SAMPLE_BLOCKS = 16
+SAMPLE_BLOCK_SIZE = 64 * 1024
+FULL_HASH_CHUNK = 1024 * 1024
+MAX_HEADER_HASH = 16 * 1024 * 1024
+
+
+def compute_fingerprint(path, full=False):
+    """Content fingerprint of a LoRA file.
+
+    Sampled fingerprints read the size, the safetensors header (or the first
+    block for other formats) and evenly spaced blocks, so files that differ
+    only outside the sampled blocks collide; full fingerprints hash everything.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    size = os.path.getsize(path)
+    digest.update(struct.pack("<Q", size))
+    with open(path, "rb") as f:
+        if full:
+            for chunk in iter(lambda: f.read(FULL_HASH_CHUNK), b""):
+                digest.update(chunk)
+            return "full:" + digest.hexdigest()
+
+        head = f.read(8)
+        digest.update(head)
+        if path.lower().endswith(".safetensors") and len(head) == 8:
+            (header_size,) = struct.unpack("<Q", head)
+            digest.update(f.read(min(header_size, MAX_HEADER_HASH)))
+        if size <= SAMPLE_BLOCKS * SAMPLE_BLOCK_SIZE:
+            f.seek(0)
+            digest.update(f.read())
+        else:
+            stride = (size - SAMPLE_BLOCK_SIZE) // (SAMPLE_BLOCKS - 1)
+            for i in range(SAMPLE_BLOCKS):
+                f.seek(i * stride)
+                digest.update(f.read(SAMPLE_BLOCK_SIZE))
+    return "sampled:" + digest.hexdigest()
+
+
+class LoraFingerprintIndex:
+    """Fingerprints of LoRA files, persisted in SQLite and recomputed only
+    when a file's size or mtime changes."""
+
+    def __init__(self, db_path, full=False):
+        self.db_path = db_path or ":memory:"
+        self.full = full
+        self._lock = threading.Lock()
+        self._memo = {}  # (path, size, mtime_ns) -> fingerprint
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS fingerprints ("
+                "path TEXT NOT NULL, full INTEGER NOT NULL, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, "
+                "fingerprint TEXT NOT NULL, PRIMARY KEY (path, full))")
+
+    def get(self, path):
+        st = os.stat(path)
+        memo_key = (path, st.st_size, st.st_mtime_ns)
+        fingerprint = self._memo.get(memo_key)
+        if fingerprint is not None:
+            return fingerprint
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, fingerprint FROM fingerprints WHERE path = ? AND full = ?",
+                (path, int(self.full))).fetchone()
+        if row is not None and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+            fingerprint = row[2]
+        else:
+            fingerprint = compute_fingerprint(path, self.full)
+            with self._lock, self._conn:
+                self._conn.execute("INSERT OR REPLACE INTO fingerprints VALUES (?, ?, ?, ?, ?)",
+                                   (path, int(self.full), st.st_size, st.st_mtime_ns, fingerprint))
+        self._memo[memo_key] = fingerprint
+        return fingerprint
+
+    def duplicate_groups(self, paths):
+        """Group paths with identical content. Only groups of two or more are returned."""
+        groups = {}
+        for path in paths:
+            try:
+                groups.setdefault(self.get(path), []).append(path)
+            except OSError as e:
+                logger.warning("Could not fingerprint %s: %s", path, str(e))
+        return [sorted(group) for group in groups.values() if len(group) > 1]
+
+
+def find_duplicate_loras(lora_dirs):
+    """Report LoRA files with identical content across lora_dirs.
+
+    Returns a list of groups, each a list of absolute paths.
+    """
+    from .lora_index import get_lora_index
+
+    index = get_lora_index()
+    paths = {index.resolve(name) for name in index.refresh(lora_dirs)}
+    paths.update(index.shadowed_paths())
+    groups = get_lora_fingerprints().duplicate_groups(sorted(paths))
+    for group in groups:
+        logger.info("Identical LoRA files: %s", ", ".join(group))
+    return groups
+
+
+_fingerprints = None
+_fingerprints_lock = threading.Lock()
+
+
+def get_lora_fingerprints():
+    """Return the fingerprint index shared by the loaders and caches."""
+    global _fingerprints
+    with _fingerprints_lock:
+        if _fingerprints is None:
+            from .lora_metadata import DEFAULT_DB_PATH
+            db_path = os.environ.get("LORAS_LOADER_METADATA_DB", DEFAULT_DB_PATH)
+            full = os.environ.get("LORAS_LOADER_FULL_HASH", "") not in ("", "0")
+            try:
+                _fingerprints = LoraFingerprintIndex(db_path, full=full)
+            except sqlite3.Error as e:
+                logger.warning("Could not open LoRA fingerprint index %s, keeping it in memory: %s", db_path, str(e))
+                _fingerprints = LoraFingerprintIndex(None, full=full)
+        return _fingerprints
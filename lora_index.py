@@ -0,0 +1,496 @@
+import json
+import os
+import re
+import threading
+import time
+import queue
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from stat import S_ISDIR
+
+from .instrumentation import logger, count
+from .lora_fingerprint import get_lora_fingerprints
+
+# Used when ComfyUI's folder_paths isn't available, e.g. by the command line
+# tools. Inside ComfyUI the extensions it accepts for the loras folder are used.
+# This is ComfyUI's supported_pt_extensions, so an index saved by the tools is
+# reused by the server.
+LORA_EXTENSIONS = ('.bin', '.ckpt', '.pkl', '.pt', '.pt2', '.pth', '.safetensors', '.sft')
+
+# The index is persisted next to this file so a server restart doesn't pay for
+# a cold scan. Set LORAS_LOADER_INDEX_PATH to move it, or to an empty string to
+# keep the index in memory only.
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), ".lora_index.json")
+INDEX_VERSION = 1
+
+# Directories are listed by up to DEFAULT_SCAN_WORKERS threads, and a directory
+# that takes longer than DEFAULT_SCAN_TIMEOUT seconds (a hung network mount)
+# keeps its previous listing. See LORAS_LOADER_SCAN_WORKERS/_SCAN_TIMEOUT.
+DEFAULT_SCAN_WORKERS = 8
+DEFAULT_SCAN_TIMEOUT = 10.0
+
+# Minimum trigram similarity (Dice coefficient) for a fuzzy name match
+FUZZY_CUTOFF = 0.4
+
+
+# Name given to a shadowed file with different content, e.g. "style.safetensors (2)"
+_SHADOW_NAME = re.compile(r"^(.*) \((\d+)\)$")
+
+
+def lora_extensions():
+    """File extensions ComfyUI lists in the loras folder, lower case.
+
+    An empty tuple means every file is listed, as in ComfyUI.
+    """
+    try:
+        import folder_paths
+    except ImportError:
+        return tuple(sorted(LORA_EXTENSIONS))
+    extensions = None
+    folders = getattr(folder_paths, "folder_names_and_paths", None)
+    if isinstance(folders, dict) and "loras" in folders:
+        extensions = folders["loras"][1]
+    if extensions is None:
+        extensions = getattr(folder_paths, "supported_pt_extensions", LORA_EXTENSIONS)
+    return tuple(sorted(ext.lower() for ext in extensions))
+
+
+class _DaemonPool:
+    """Minimal executor running on daemon threads.
+
+    concurrent.futures joins its worker threads when the interpreter exits, so
+    a scan stuck on a hung network mount would block ComfyUI's shutdown.
+    """
+
+    def __init__(self, max_workers, thread_name_prefix):
+        self.max_workers = max_workers
+        self.thread_name_prefix = thread_name_prefix
+        self._queue = queue.SimpleQueue()
+        self._threads = []
+
+    def submit(self, fn, *args):
+        future = Future()
+        self._queue.put((future, fn, args))
+        if len(self._threads) < self.max_workers:
+            thread = threading.Thread(target=self._work, daemon=True,
+                                      name=f"{self.thread_name_prefix}_{len(self._threads)}")
+            self._threads.append(thread)
+            thread.start()
+        return future
+
+    def shutdown(self):
+        """Let the workers exit once the queue is empty, without waiting for them."""
+        for _ in self._threads:
+            self._queue.put(None)
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            future, fn, args = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
+
+
+def _alias_keys(name):
+    """Lookup keys for a name, most specific first.
+
+    Covers separator style, case, the extension and, for files in
+    subdirectories, the bare filename.
+    """
+    normalized = name.replace("\\", "/")
+    stem = os.path.splitext(normalized)[0]
+    base = normalized.rsplit("/", 1)[-1]
+    base_stem = os.path.splitext(base)[0]
+    keys = []
+    for key in (normalized, normalized.lower(), stem, stem.lower(), base, base.lower(), base_stem, base_stem.lower()):
+        if key not in keys:
+            keys.append(key)
+    return keys
+
+
+def _ngrams(name, n=3):
+    text = " " + os.path.splitext(name.replace("\\", "/"))[0].lower() + " "
+    return {text[i:i + n] for i in range(max(1, len(text) - n + 1))}
+
+
+class LoraIndex:
+    """Recursive listing of the LoRA directories.
+
+    Every directory's mtime is remembered, and only directories whose mtime
+    changed since the previous refresh are listed again. Directories are
+    listed concurrently by a bounded pool of daemon threads.
+    """
+
+    def __init__(self, index_path=None, workers=DEFAULT_SCAN_WORKERS, dir_timeout=DEFAULT_SCAN_TIMEOUT,
+                 extensions=None):
+        self.index_path = index_path
+        self.extensions = tuple(extensions) if extensions is not None else lora_extensions()
+        self.workers = max(1, workers)
+        self.dir_timeout = dir_timeout
+        self._hung = {}  # (root, relative_dir) -> Future of a scan that timed out
+        self._lock = threading.Lock()
+        # {root: {relative_dir: {"mtime": float, "files": [...], "dirs": [...]}}}
+        self._dirs = {}
+        self._names = []
+        self._paths = {}
+        # Name lookup structures, updated incrementally as files come and go
+        self._aliases = {}  # alias key -> sorted list of names
+        self._grams = {}  # trigram -> set of names
+        self._gram_counts = {}  # name -> number of trigrams
+        self._shadowed = {}  # name -> paths hidden by an earlier directory
+        self._shadow_names = {}  # "name (n)" -> path of a shadowed file with different content
+        self._roots = None
+        self._loaded = False
+
+    def refresh(self, lora_dirs):
+        """Bring the index up to date and return the sorted LoRA names."""
+        with self._lock:
+            if not self._loaded:
+                self._load()
+                self._loaded = True
+
+            dirs, changed = self._crawl(list(dict.fromkeys(lora_dirs)))
+            for root, tree in dirs.items():
+                if set(tree) != set(self._dirs.get(root, {})):
+                    changed = True
+            if list(dirs) != list(self._dirs):
+                changed = True
+            self._dirs = dirs
+            self._roots = list(lora_dirs)
+
+            if changed or not self._paths:
+                self._rebuild()
+                if changed:
+                    self._save()
+            return list(self._names)
+
+    def names(self):
+        return list(self._names)
+
+    def covers(self, lora_dirs):
+        """Whether the index was last refreshed for exactly these directories."""
+        return self._roots == list(lora_dirs)
+
+    def shadowed_paths(self):
+        """Paths of files hidden by a same-named file in an earlier directory."""
+        return [path for paths in self._shadowed.values() for path in paths]
+
+    def resolve(self, name):
+        """Return the absolute path of a LoRA name, or None if it isn't indexed."""
+        return self._paths.get(name)
+
+    def lookup(self, name):
+        """Return the indexed name matching name, or None.
+
+        Exact names are matched first, then case-insensitive, extension-less
+        and bare filename aliases.
+        """
+        if name in self._paths:
+            return name
+        match = _SHADOW_NAME.match(name)
+        if match is not None and self._is_lora(match.group(1)):
+            # A shadowed file that is gone or identical again, don't let the
+            # aliases turn it into the file that shadowed it
+            return None
+        aliases = self._aliases
+        for key in _alias_keys(name):
+            names = aliases.get(key)
+            if names:
+                return names[0]
+        return None
+
+    def fuzzy_lookup(self, name, cutoff=FUZZY_CUTOFF):
+        """Return (indexed name, score) of the most similar name, or None."""
+        query = _ngrams(name)
+        with self._lock:
+            shared = {}
+            for gram in query:
+                for candidate in self._grams.get(gram, ()):
+                    shared[candidate] = shared.get(candidate, 0) + 1
+            best = None
+            for candidate, hits in shared.items():
+                score = 2.0 * hits / (len(query) + self._gram_counts[candidate])
+                if best is None or score > best[1] or (score == best[1] and candidate < best[0]):
+                    best = (candidate, score)
+        if best is None or best[1] < cutoff:
+            return None
+        return best
+
+    def _crawl(self, roots):
+        """List roots and their subdirectories concurrently.
+
+        Each finished directory is merged into the new tree right away and its
+        subdirectories are queued, so slow directories don't hold up the rest.
+        A directory not listed within dir_timeout of being queued, whether it
+        hung or waited behind hung ones, keeps its previous listing, so a crawl
+        never waits longer than dir_timeout per directory level. A hung scan
+        isn't started again while it is still running.
+        Returns ({root: tree}, changed).
+        """
+        trees = {root: {} for root in roots}
+        seen = {root: set() for root in roots}
+        submitted = {}  # (root, rel) -> time the directory was queued
+        pending = {}  # Future -> (root, rel)
+        changed = False
+        pool = _DaemonPool(self.workers, "lora_scan")
+
+        def submit(root, rel, st):
+            hung = self._hung.get((root, rel))
+            if hung is not None:
+                if not hung.done():
+                    self._keep_subtree(root, rel, trees[root])
+                    return
+                del self._hung[(root, rel)]
+            submitted[(root, rel)] = time.monotonic()
+            pending[pool.submit(self._visit, root, rel, st)] = (root, rel)
+
+        try:
+            for root in roots:
+                submit(root, "", None)
+            while pending:
+                now = time.monotonic()
+                deadline = min(submitted[key] for key in pending.values()) + self.dir_timeout
+                timeout = max(0.0, deadline - now)
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    root, rel = pending.pop(future)
+                    result = future.result()
+                    if result is None:
+                        if not rel:
+                            # Missing roots are skipped, like os.path.isdir failing
+                            trees.pop(root, None)
+                        continue
+                    st, entry, children, rescanned = result
+                    if not rel:
+                        seen[root].add((st.st_dev, st.st_ino))
+                    trees[root][rel] = entry
+                    changed = changed or rescanned
+                    for name, child_st in children:
+                        # Guard against symlink loops
+                        key = (child_st.st_dev, child_st.st_ino)
+                        if key in seen[root]:
+                            continue
+                        seen[root].add(key)
+                        submit(root, os.path.join(rel, name) if rel else name, child_st)
+
+                now = time.monotonic()
+                for future, (root, rel) in list(pending.items()):
+                    if now - submitted[(root, rel)] < self.dir_timeout:
+                        continue
+                    del pending[future]
+                    path = os.path.join(root, rel) if rel else root
+                    if future.cancel():
+                        # Still queued behind slow or hung directories
+                        logger.warning("LoRA directory %s wasn't listed within %.1f s, keeping its previous contents",
+                                       path, self.dir_timeout)
+                    else:
+                        self._hung[(root, rel)] = future
+                        logger.warning("Listing LoRA directory %s took more than %.1f s, keeping its previous "
+                                       "contents", path, self.dir_timeout)
+                    count("LoraIndex", "scan_timeouts")
+                    if root in trees:
+                        self._keep_subtree(root, rel, trees[root])
+        finally:
+            # Don't wait for hung scans, their threads finish on their own
+            pool.shutdown()
+        return trees, changed
+
+    def _keep_subtree(self, root, rel, tree):
+        prefix = rel + os.sep if rel else ""
+        for old_rel, entry in self._dirs.get(root, {}).items():
+            if old_rel == rel or old_rel.startswith(prefix):
+                tree.setdefault(old_rel, entry)
+
+    def _visit(self, root, rel, st):
+        """List one directory, unless its mtime shows it didn't change.
+
+        Returns (stat, entry, [(subdirectory, stat)], rescanned), or None if
+        the directory can't be read.
+        """
+        path = os.path.join(root, rel) if rel else root
+        if st is None:
+            try:
+                st = os.stat(path)
+            except OSError:
+                return None
+            if not S_ISDIR(st.st_mode):
+                return None
+
+        old = self._dirs.get(root, {}).get(rel)
+        if old is not None and old["mtime"] == st.st_mtime:
+            children = []
+            for name in old["dirs"]:
+                try:
+                    children.append((name, os.stat(os.path.join(path, name))))
+                except OSError:
+                    continue
+            return st, old, children, False
+        entry, children = self._scan_dir(path, st.st_mtime)
+        return st, entry, children, True
+
+    def _is_lora(self, filename):
+        return not self.extensions or os.path.splitext(filename)[1].lower() in self.extensions
+
+    def _scan_dir(self, path, mtime):
+        files = []
+        children = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        # is_dir() uses the file type from the listing, stat()
+                        # is only needed for subdirectories
+                        if entry.is_dir():
+                            children.append((entry.name, entry.stat()))
+                        elif self._is_lora(entry.name):
+                            files.append(entry.name)
+                    except OSError:
+                        continue
+        except OSError as e:
+            logger.warning("Could not scan LoRA directory %s: %s", path, str(e))
+        children.sort(key=lambda child: child[0])
+        entry = {"mtime": mtime, "files": sorted(files), "dirs": [name for name, _ in children]}
+        return entry, children
+
+    def _rebuild(self):
+        paths = {}
+        shadowed = {}
+        # Directories earlier in the search order win for duplicate names
+        for root, tree in self._dirs.items():
+            for rel, entry in tree.items():
+                for filename in entry["files"]:
+                    name = os.path.join(rel, filename) if rel else filename
+                    if name not in paths:
+                        paths[name] = os.path.join(root, name)
+                    else:
+                        shadowed.setdefault(name, []).append(os.path.join(root, name))
+        # A shadowed file with different content is listed as "name (2)",
+        # numbered by its directory's position among the copies, instead of
+        # silently collapsing into the first one. These names go after the
+        # others, so they don't shift the indices of regular LoRAs.
+        shadow_names = {}
+        for name, hidden in shadowed.items():
+            for copy, path in enumerate(hidden, start=2):
+                if not self._same_content(paths[name], path):
+                    shadow_names[f"{name} ({copy})"] = path
+        self._shadowed = shadowed
+        for name in self._paths.keys() - paths.keys() - shadow_names.keys():
+            self._remove_name(name)
+        self._shadow_names = shadow_names
+        for name in paths.keys() - self._paths.keys():
+            self._add_name(name)
+        self._names = sorted(paths) + sorted(shadow_names)
+        paths.update(shadow_names)
+        self._paths = paths
+
+    @staticmethod
+    def _same_content(path, other):
+        fingerprints = get_lora_fingerprints()
+        try:
+            return fingerprints.get(path) == fingerprints.get(other)
+        except OSError as e:
+            logger.warning("Could not compare %s with %s: %s", path, other, str(e))
+            return True
+
+    def _add_name(self, name):
+        # Names of shadowed files are only matched exactly, keep them out of
+        # the aliases so they never win a short name lookup
+        if name in self._shadow_names:
+            return
+        for key in _alias_keys(name):
+            names = self._aliases.setdefault(key, [])
+            names.append(name)
+            names.sort()
+        grams = _ngrams(name)
+        for gram in grams:
+            self._grams.setdefault(gram, set()).add(name)
+        self._gram_counts[name] = len(grams)
+
+    def _remove_name(self, name):
+        for key in _alias_keys(name):
+            names = self._aliases.get(key)
+            if names and name in names:
+                names.remove(name)
+                if not names:
+                    del self._aliases[key]
+        for gram in _ngrams(name):
+            names = self._grams.get(gram)
+            if names is not None:
+                names.discard(name)
+                if not names:
+                    del self._grams[gram]
+        self._gram_counts.pop(name, None)
+
+    def _load(self):
+        if not self.index_path or not os.path.isfile(self.index_path):
+            return
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            # Listings made for other extensions would hide or add files
+            if data.get("version") == INDEX_VERSION and data.get("extensions") == list(self.extensions):
+                self._dirs = data["dirs"]
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Ignoring unreadable LoRA index %s: %s", self.index_path, str(e))
+            self._dirs = {}
+
+    def _save(self):
+        if not self.index_path:
+            return
+        tmp_path = f"{self.index_path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": INDEX_VERSION, "extensions": list(self.extensions), "dirs": self._dirs}, f)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            logger.warning("Could not save LoRA index to %s: %s", self.index_path, str(e))
+
+
+def resolve_lora_path(name, lora_dirs):
+    """Find a LoRA file by name, using the shared index before probing the directories.
+
+    Besides exact names, the index accepts case-insensitive and extension-less
+    names and bare filenames of LoRAs in subdirectories. Indexed paths are
+    returned without another stat, which costs a round trip on network mounts;
+    a file deleted since the last refresh fails when it is loaded.
+    """
+    index = get_lora_index()
+    if not index.covers(lora_dirs):
+        index.refresh(lora_dirs)
+    indexed_name = index.lookup(name)
+    lora_path = index.resolve(indexed_name) if indexed_name is not None else None
+    if lora_path is not None:
+        return lora_path
+    # The index may be stale, probe the directories directly
+    for lora_dir in lora_dirs:
+        potential_path = os.path.join(lora_dir, name)
+        if os.path.isfile(potential_path):
+            return potential_path
+    return None
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_lora_index():
+    """Return the LoRA index shared by all loader nodes."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            try:
+                workers = int(os.environ.get("LORAS_LOADER_SCAN_WORKERS", DEFAULT_SCAN_WORKERS))
+            except ValueError:
+                workers = DEFAULT_SCAN_WORKERS
+            try:
+                dir_timeout = float(os.environ.get("LORAS_LOADER_SCAN_TIMEOUT", DEFAULT_SCAN_TIMEOUT))
+            except ValueError:
+                dir_timeout = DEFAULT_SCAN_TIMEOUT
+            _index = LoraIndex(os.environ.get("LORAS_LOADER_INDEX_PATH", DEFAULT_INDEX_PATH), workers, dir_timeout)
+        return _index
@@ -0,0 +1,194 @@
+import hashlib
+import threading
+import weakref
+from collections import OrderedDict
+from collections.abc import Mapping
+
+from .instrumentation import logger, count
+
+# Number of model architectures and of (architecture, LoRA) key maps kept
+MAX_ARCHITECTURES = 8
+MAX_LORA_MAPS = 1024
+
+
+class _KeyRecorder(Mapping):
+    """Wraps a LoRA state dict and records which keys are read."""
+
+    def __init__(self, state_dict):
+        self._state_dict = state_dict
+        self.read = set()
+
+    def __getitem__(self, key):
+        value = self._state_dict[key]
+        self.read.add(key)
+        return value
+
+    def __iter__(self):
+        return iter(self._state_dict)
+
+    def __len__(self):
+        return len(self._state_dict)
+
+    def __contains__(self, key):
+        return key in self._state_dict
+
+
+class _KeySubset(Mapping):
+    """View of the keys of a LoRA state dict that match the model."""
+
+    def __init__(self, state_dict, keys):
+        self._state_dict = state_dict
+        self._keys = keys
+
+    def __getitem__(self, key):
+        if key not in self._keys:
+            raise KeyError(key)
+        return self._state_dict[key]
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return key in self._keys
+
+
+class LoraKeyMaps:
+    """Caches ComfyUI's LoRA key matching per model architecture.
+
+    The key map from LoRA key prefixes to model weights is built once for each
+    architecture, identified by a hash of the model's state dict keys. For each
+    LoRA applied to an architecture, the entries that matched are remembered,
+    so later loads only check those instead of the whole map, and keys that
+    don't match the model are reported once instead of on every load.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._fingerprints = weakref.WeakKeyDictionary()  # module -> architecture fingerprint
+        self._architectures = OrderedDict()  # (unet, clip) fingerprints -> (key_map, clip_targets)
+        self._loras = OrderedDict()  # (architecture, lora_id) -> (key_map subset, matched LoRA keys)
+
+    def _fingerprint(self, module):
+        try:
+            return self._fingerprints[module]
+        except (KeyError, TypeError):
+            pass
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(type(module).__name__.encode())
+        digest.update(type(getattr(module, "model_config", None)).__name__.encode())
+        for key in sorted(module.state_dict().keys()):
+            digest.update(key.encode())
+            digest.update(b"\0")
+        fingerprint = digest.hexdigest()
+        try:
+            self._fingerprints[module] = fingerprint
+        except TypeError:
+            pass
+        return fingerprint
+
+    def architecture(self, model, clip):
+        """Return (architecture, key_map, clip_targets) for a MODEL/CLIP pair."""
+        import comfy.lora
+
+        unet = model.model if model is not None else None
+        text_encoder = clip.cond_stage_model if clip is not None else None
+        architecture = (self._fingerprint(unet) if unet is not None else None,
+                        self._fingerprint(text_encoder) if text_encoder is not None else None)
+        with self._lock:
+            entry = self._architectures.get(architecture)
+            if entry is not None:
+                self._architectures.move_to_end(architecture)
+                count("LoraKeyMaps", "architecture_hits")
+                return architecture, entry[0], entry[1]
+
+        count("LoraKeyMaps", "architecture_misses")
+        key_map = {}
+        if unet is not None:
+            key_map = comfy.lora.model_lora_keys_unet(unet, key_map)
+        clip_map = {}
+        if text_encoder is not None:
+            clip_map = comfy.lora.model_lora_keys_clip(text_encoder, {})
+            key_map.update(clip_map)
+        clip_targets = frozenset(clip_map.values())
+        with self._lock:
+            self._architectures[architecture] = (key_map, clip_targets)
+            while len(self._architectures) > MAX_ARCHITECTURES:
+                self._architectures.popitem(last=False)
+        return architecture, key_map, clip_targets
+
+    def load_patches(self, lora_sd, model, clip, lora_id=None, name="LoRA"):
+        """Match a LoRA against a MODEL/CLIP pair like comfy.lora.load_lora.
+
+        lora_id identifies the LoRA's contents; without it nothing is remembered
+        about the LoRA. Returns (patches, clip_targets).
+        """
+        import comfy.lora
+        try:
+            import comfy.lora_convert
+            lora_sd = comfy.lora_convert.convert_lora(lora_sd)
+        except ImportError:
+            pass
+
+        architecture, key_map, clip_targets = self.architecture(model, clip)
+        key = (architecture, lora_id)
+        entry = None
+        if lora_id is not None:
+            with self._lock:
+                entry = self._loras.get(key)
+                if entry is not None:
+                    self._loras.move_to_end(key)
+        if entry is not None:
+            count("LoraKeyMaps", "lora_hits")
+            lora_map, matched = entry
+            return comfy.lora.load_lora(_KeySubset(lora_sd, matched), lora_map), clip_targets
+
+        count("LoraKeyMaps", "lora_misses")
+        recorder = _KeyRecorder(lora_sd)
+        patches = comfy.lora.load_lora(recorder, key_map)
+        matched = frozenset(recorder.read)
+        unmatched = [k for k in lora_sd if k not in matched]
+        if unmatched:
+            logger.warning("%s: %d of %d keys don't match this model and are ignored, e.g. %s",
+                           name, len(unmatched), len(matched) + len(unmatched), ", ".join(sorted(unmatched)[:3]))
+        if lora_id is not None:
+            lora_map = {k: v for k, v in key_map.items() if v in patches}
+            with self._lock:
+                self._loras[key] = (lora_map, matched)
+                while len(self._loras) > MAX_LORA_MAPS:
+                    self._loras.popitem(last=False)
+        return patches, clip_targets
+
+    def clear(self):
+        with self._lock:
+            self._architectures.clear()
+            self._loras.clear()
+
+
+def apply_with_key_maps(model, clip, lora_sd, strength_model, strength_clip, lora_id=None, name="LoRA"):
+    """comfy.sd.load_lora_for_models using the cached key maps."""
+    patches, _ = get_lora_key_maps().load_patches(lora_sd, model, clip, lora_id=lora_id, name=name)
+    model_out = model
+    clip_out = clip
+    if model is not None:
+        model_out = model.clone()
+        model_out.add_patches(patches, strength_model)
+    if clip is not None:
+        clip_out = clip.clone()
+        clip_out.add_patches(patches, strength_clip)
+    return (model_out, clip_out)
+
+
+_key_maps = None
+_key_maps_lock = threading.Lock()
+
+
+def get_lora_key_maps():
+    """Return the key map cache shared by all loader nodes."""
+    global _key_maps
+    with _key_maps_lock:
+        if _key_maps is None:
+            _key_maps = LoraKeyMaps()
+        return _key_maps
@@ -0,0 +1,144 @@
+import json
+import os
+import sqlite3
+import threading
+
+from .instrumentation import logger
+from .lazy_safetensors import read_safetensors_header
+from .lora_index import get_lora_index
+
+# SQLite sidecar holding the safetensors metadata of every LoRA. Set
+# LORAS_LOADER_METADATA_DB to move it, or to an empty string to keep it in memory.
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), ".lora_metadata.sqlite3")
+
+
+def read_lora_metadata(path):
+    """Return the __metadata__ of a safetensors file, reading only its header."""
+    if not path.lower().endswith(".safetensors"):
+        return {}
+    header, _ = read_safetensors_header(path)
+    return header.get("__metadata__") or {}
+
+
+class LoraMetadataIndex:
+    """Persistent cache of LoRA safetensors metadata.
+
+    Entries are keyed by path and validated against size and mtime, so each
+    changed file costs one header read and unchanged files cost a stat.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path or ":memory:"
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS metadata ("
+                "path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, metadata TEXT NOT NULL)")
+
+    def get(self, path):
+        """Return the metadata of path, reading the header only if the file changed."""
+        st = os.stat(path)
+        with self._lock:
+            row = self._conn.execute("SELECT size, mtime_ns, metadata FROM metadata WHERE path = ?",
+                                     (path,)).fetchone()
+        if row is not None and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+            return json.loads(row[2])
+
+        try:
+            metadata = read_lora_metadata(path)
+        except (OSError, ValueError) as e:
+            logger.warning("Could not read metadata of %s: %s", path, str(e))
+            metadata = {}
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?)",
+                               (path, st.st_size, st.st_mtime_ns, json.dumps(metadata)))
+        return metadata
+
+    def update(self, paths):
+        """Bring the entries for paths up to date and drop entries of other files.
+
+        Returns the number of headers that had to be read.
+        """
+        paths = list(paths)
+        with self._lock:
+            known = {row[0]: (row[1], row[2]) for row in
+                     self._conn.execute("SELECT path, size, mtime_ns FROM metadata")}
+        rows = []
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if known.get(path) == (st.st_size, st.st_mtime_ns):
+                continue
+            try:
+                metadata = read_lora_metadata(path)
+            except (OSError, ValueError) as e:
+                logger.warning("Could not read metadata of %s: %s", path, str(e))
+                metadata = {}
+            rows.append((path, st.st_size, st.st_mtime_ns, json.dumps(metadata)))
+
+        stale = [(path,) for path in known.keys() - set(paths)]
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?)", rows)
+            self._conn.executemany("DELETE FROM metadata WHERE path = ?", stale)
+        return len(rows)
+
+
+def trigger_words(metadata, top_k=5):
+    """Most likely trigger words of a LoRA, from its training metadata.
+
+    An explicit modelspec.trigger_phrase comes first, followed by the most
+    frequent ss_tag_frequency tags. ss_output_name is used when there are no tags.
+    """
+    words = []
+    phrase = metadata.get("modelspec.trigger_phrase")
+    if phrase:
+        words.extend(w.strip() for w in phrase.split(",") if w.strip())
+
+    frequencies = {}
+    try:
+        tag_frequency = json.loads(metadata.get("ss_tag_frequency") or "{}")
+    except ValueError:
+        tag_frequency = {}
+    # Tag counts are grouped per training dataset directory
+    for tags in tag_frequency.values():
+        if not isinstance(tags, dict):
+            continue
+        for tag, tag_count in tags.items():
+            tag = tag.strip()
+            if tag:
+                frequencies[tag] = frequencies.get(tag, 0) + tag_count
+    for tag, _ in sorted(frequencies.items(), key=lambda item: (-item[1], item[0])):
+        if tag not in words:
+            words.append(tag)
+
+    if not words and metadata.get("ss_output_name"):
+        words.append(metadata["ss_output_name"])
+    return words[:top_k]
+
+
+def build_metadata_index(lora_dirs):
+    """Index the metadata of every LoRA in lora_dirs. Returns the number of headers read."""
+    index = get_lora_index()
+    names = index.refresh(lora_dirs)
+    return get_lora_metadata_index().update(index.resolve(name) for name in names)
+
+
+_metadata_index = None
+_metadata_index_lock = threading.Lock()
+
+
+def get_lora_metadata_index():
+    """Return the metadata index shared by all nodes."""
+    global _metadata_index
+    with _metadata_index_lock:
+        if _metadata_index is None:
+            db_path = os.environ.get("LORAS_LOADER_METADATA_DB", DEFAULT_DB_PATH)
+            try:
+                _metadata_index = LoraMetadataIndex(db_path)
+            except sqlite3.Error as e:
+                logger.warning("Could not open LoRA metadata index %s, keeping it in memory: %s", db_path, str(e))
+                _metadata_index = LoraMetadataIndex(None)
+        return _metadata_index
@@ -0,0 +1,186 @@
+from collections.abc import Mapping
+
+# In-memory storage options for LoRA weights. "default" keeps the dtypes from
+# the file, fp16/bf16 downcast floating point weights and int8 quantizes weight
+# matrices with one scale per output channel.
+PRECISIONS = ("default", "fp16", "bf16", "int8")
+
+# Suffix of the per-channel scales stored next to int8 weights in files
+# written by tools/convert_loras.py
+SCALE_SUFFIX = ".__int8_scale__"
+FORMAT_METADATA_KEY = "loras_loader.precision"
+# Dtype int8 weights are restored to. Scales are always stored as float32,
+# since small scales of fp16 LoRAs would lose precision as fp16 subnormals.
+DTYPE_METADATA_KEY = "loras_loader.dtype"
+
+
+def _is_weight_matrix(tensor):
+    # Alphas, biases and other 1-D tensors are small and numerically sensitive,
+    # so only matrices and convolution kernels are converted
+    return tensor.is_floating_point() and tensor.dim() >= 2
+
+
+def _float_dtype(precision):
+    import torch
+    return {"fp16": torch.float16, "bf16": torch.bfloat16}[precision]
+
+
+def quantize_per_channel(tensor):
+    """Quantize a float tensor to int8 with a scale per slice of dim 0.
+
+    Returns (int8 tensor, float32 scales shaped to broadcast against it).
+    """
+    import torch
+
+    values = tensor.to(torch.float32)
+    reduce_dims = tuple(range(1, values.dim()))
+    amax = values.abs().amax(dim=reduce_dims, keepdim=True)
+    scale = (amax / 127.0).clamp_(min=1e-12)
+    quantized = torch.round(values / scale).clamp_(-127, 127).to(torch.int8)
+    return quantized, scale
+
+
+def dequantize_per_channel(quantized, scale, dtype):
+    return (quantized.to(scale.dtype) * scale).to(dtype)
+
+
+class QuantizedStateDict(Mapping):
+    """Read-only state dict holding weight matrices as int8 plus scales.
+
+    Tensors are dequantized to their original dtype when they are read, so the
+    LoRA backend sees ordinary tensors and only the cached copy is compact.
+    """
+
+    def __init__(self, quantized, dtypes, plain):
+        self._quantized = quantized  # key -> (int8 tensor, scale)
+        self._dtypes = dtypes  # key -> original dtype
+        self._plain = plain  # key -> tensor stored as is
+        self._keys = list(plain) + list(quantized)
+
+    @classmethod
+    def from_state_dict(cls, state_dict):
+        quantized, dtypes, plain = {}, {}, {}
+        for key, tensor in state_dict.items():
+            if hasattr(tensor, "dim") and _is_weight_matrix(tensor):
+                quantized[key] = quantize_per_channel(tensor)
+                dtypes[key] = tensor.dtype
+            else:
+                plain[key] = tensor
+        return cls(quantized, dtypes, plain)
+
+    @classmethod
+    def from_packed(cls, state_dict, dtype=None):
+        """Wrap a state dict read from a file written with int8 precision.
+
+        dtype is the dtype to restore weights to (see read_packed_dtype). Without
+        it the dtype of the scales is used, as in files that didn't record it.
+        """
+        import torch
+
+        quantized, dtypes, plain = {}, {}, {}
+        for key, tensor in state_dict.items():
+            if key.endswith(SCALE_SUFFIX):
+                continue
+            scale = state_dict.get(key + SCALE_SUFFIX)
+            if scale is None:
+                plain[key] = tensor
+                continue
+            quantized[key] = (tensor, scale.to(torch.float32))
+            dtypes[key] = dtype or scale.dtype
+        return cls(quantized, dtypes, plain)
+
+    @property
+    def nbytes(self):
+        total = 0
+        for tensor in self._plain.values():
+            if hasattr(tensor, "element_size"):
+                total += tensor.numel() * tensor.element_size()
+        for quantized, scale in self._quantized.values():
+            total += quantized.numel() + scale.numel() * scale.element_size()
+        return total
+
+    def __getitem__(self, key):
+        entry = self._quantized.get(key)
+        if entry is None:
+            return self._plain[key]
+        return dequantize_per_channel(entry[0], entry[1], self._dtypes[key])
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return key in self._quantized or key in self._plain
+
+
+def is_packed_int8(state_dict):
+    return any(key.endswith(SCALE_SUFFIX) for key in state_dict)
+
+
+def read_packed_dtype(path):
+    """Dtype recorded for the weights of an int8 file, or None."""
+    import torch
+    from .lazy_safetensors import read_safetensors_header
+
+    if not path.lower().endswith(".safetensors"):
+        return None
+    header, _ = read_safetensors_header(path)
+    metadata = header.get("__metadata__") or {}
+    if metadata.get(FORMAT_METADATA_KEY) != "int8":
+        return None
+    dtype = getattr(torch, metadata.get(DTYPE_METADATA_KEY) or "", None)
+    return dtype if isinstance(dtype, torch.dtype) else None
+
+
+def convert_state_dict(state_dict, precision):
+    """Return state_dict stored with the given precision.
+
+    Works on any mapping of tensors, including lazily loaded ones, which are
+    read once and replaced by compact in-memory copies.
+    """
+    if precision in (None, "default"):
+        return state_dict
+    if precision == "int8":
+        if isinstance(state_dict, QuantizedStateDict):
+            return state_dict
+        return QuantizedStateDict.from_state_dict(state_dict)
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown LoRA precision '{precision}', expected one of {', '.join(PRECISIONS)}")
+    dtype = _float_dtype(precision)
+    return {
+        key: tensor.to(dtype) if hasattr(tensor, "dim") and _is_weight_matrix(tensor) else tensor
+        for key, tensor in state_dict.items()
+    }
+
+
+def pack_state_dict(state_dict, precision):
+    """Convert a state dict for saving to a safetensors file.
+
+    int8 weights are stored with their float32 scales under key + SCALE_SUFFIX.
+    Save packed_metadata(state_dict, precision) with them, so loading restores
+    the original dtype.
+    """
+    if precision != "int8":
+        return dict(convert_state_dict(state_dict, precision))
+    packed = {}
+    for key, tensor in state_dict.items():
+        if hasattr(tensor, "dim") and _is_weight_matrix(tensor):
+            quantized, scale = quantize_per_channel(tensor)
+            packed[key] = quantized
+            packed[key + SCALE_SUFFIX] = scale
+        else:
+            packed[key] = tensor
+    return packed
+
+
+def packed_metadata(state_dict, precision):
+    """safetensors metadata describing pack_state_dict(state_dict, precision)."""
+    metadata = {FORMAT_METADATA_KEY: precision}
+    if precision == "int8":
+        dtypes = {str(tensor.dtype).replace("torch.", "") for tensor in state_dict.values()
+                  if hasattr(tensor, "dim") and _is_weight_matrix(tensor)}
+        # Mixed dtypes are restored as float32, which loses nothing
+        metadata[DTYPE_METADATA_KEY] = dtypes.pop() if len(dtypes) == 1 else "float32"
+    return metadata
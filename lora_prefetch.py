@@ -0,0 +1,179 @@
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from .lora_backend import get_lora_backend
+from .lora_cache import get_lora_cache, load_lora_state_dict, lora_state_dict_variant
+from .lora_index import resolve_lora_path
+from .instrumentation import logger
+
+# Number of background threads reading upcoming LoRAs
+DEFAULT_PREFETCH_WORKERS = 2
+
+
+class _PrefetchList:
+    """Prefetches scheduled for one LoRA list."""
+
+    def __init__(self):
+        self.futures = {}  # key -> Future
+        self.durations = {}  # key -> seconds spent loading in the background
+
+
+class LoraPrefetcher:
+    """Loads upcoming LoRAs of an index sweep into the state dict cache.
+
+    Prefetches belong to the LoRA list they were scheduled for, and every node
+    (owner) follows one list at a time. Several nodes can prefetch from
+    different lists in the same workflow. When no node follows a list any
+    more, its queued prefetches are cancelled and running ones are discarded.
+    """
+
+    def __init__(self, max_workers):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="lora_prefetch")
+        self._lock = threading.Lock()
+        self._lists = {}  # list_key -> _PrefetchList
+        self._owners = weakref.WeakKeyDictionary()  # owner -> list_key
+        self._shared_key = None  # list of callers that don't pass an owner
+        self.scheduled = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.failed = 0
+        self.already_cached = 0
+        self.used = 0
+        self.late = 0
+        self.hidden_seconds = 0.0
+
+    def prefetch(self, list_key, paths, lazy=False, include_clip=True, precision="default", owner=None):
+        """Load paths in the background. list_key identifies the LoRA list and
+        owner the node following it."""
+        with self._lock:
+            if owner is None:
+                self._shared_key = list_key
+            else:
+                self._owners[owner] = list_key
+            self._drop_unfollowed_locked()
+            prefetches = self._lists.get(list_key)
+            if prefetches is None:
+                prefetches = self._lists[list_key] = _PrefetchList()
+            for path in paths:
+                key = (path, lazy, include_clip, precision)
+                if key in prefetches.futures or key in prefetches.durations:
+                    continue
+                future = self._pool.submit(self._load, list_key, prefetches, key)
+                prefetches.futures[key] = future
+                self.scheduled += 1
+
+    def claim(self, path, lazy=False, include_clip=True, precision="default"):
+        """Record that path is about to be used, for the latency statistics."""
+        key = (path, lazy, include_clip, precision)
+        with self._lock:
+            for prefetches in self._lists.values():
+                duration = prefetches.durations.pop(key, None)
+                if duration is not None:
+                    self.used += 1
+                    self.hidden_seconds += duration
+                    return
+            if any(key in prefetches.futures for prefetches in self._lists.values()):
+                # Still loading, the cache makes the caller wait for it
+                self.late += 1
+
+    def cancel(self):
+        with self._lock:
+            for prefetches in self._lists.values():
+                self._cancel_locked(prefetches)
+            self._lists.clear()
+            self._owners.clear()
+            self._shared_key = None
+
+    def _drop_unfollowed_locked(self):
+        followed = set(self._owners.values())
+        followed.add(self._shared_key)
+        for list_key in [k for k in self._lists if k not in followed]:
+            self._cancel_locked(self._lists.pop(list_key))
+
+    def _cancel_locked(self, prefetches):
+        for future in prefetches.futures.values():
+            if future.cancel():
+                self.cancelled += 1
+        prefetches.futures.clear()
+        prefetches.durations.clear()
+
+    def _load(self, list_key, prefetches, key):
+        path, lazy, include_clip, precision = key
+        try:
+            if self._lists.get(list_key) is not prefetches:
+                return
+            # Checked here, the cache key needs the file's fingerprint, which
+            # reads the file the first time it's seen
+            if get_lora_cache().contains(path, lora_state_dict_variant(path, lazy, include_clip, precision)):
+                with self._lock:
+                    self.already_cached += 1
+                return
+            start = time.perf_counter()
+            try:
+                load_lora_state_dict(path, lazy=lazy, include_clip=include_clip, precision=precision)
+            except Exception as e:
+                logger.warning("Error prefetching LoRA %s: %s", path, str(e))
+                with self._lock:
+                    self.failed += 1
+                return
+            duration = time.perf_counter() - start
+            with self._lock:
+                if self._lists.get(list_key) is prefetches:
+                    prefetches.durations[key] = duration
+                    self.completed += 1
+        finally:
+            with self._lock:
+                prefetches.futures.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "scheduled": self.scheduled,
+                "completed": self.completed,
+                "cancelled": self.cancelled,
+                "failed": self.failed,
+                "already_cached": self.already_cached,
+                "used": self.used,
+                "late": self.late,
+                "pending": sum(len(p.futures) for p in self._lists.values()),
+                "lists": len(self._lists),
+                "hidden_seconds": self.hidden_seconds,
+            }
+
+
+def prefetch_following(names, index, lookahead, lora_dirs, lazy=False, include_clip=True, precision="default",
+                       owner=None):
+    """Prefetch the lookahead LoRAs after index in names. owner is the calling node."""
+    if lookahead <= 0:
+        return
+    backend = get_lora_backend()
+    if backend is not None and not backend.uses_state_dict:
+        # The reference LoraLoader reads files itself and can't use the cache
+        return
+    paths = []
+    for name in names[index + 1:index + 1 + lookahead]:
+        lora_path = resolve_lora_path(name, lora_dirs)
+        if lora_path is not None:
+            paths.append(lora_path)
+    get_lora_prefetcher().prefetch(hash(tuple(names)), paths, lazy=lazy, include_clip=include_clip,
+                                   precision=precision, owner=owner)
+
+
+_prefetcher = None
+_prefetcher_lock = threading.Lock()
+
+
+def get_lora_prefetcher():
+    """Return the prefetcher shared by all loader nodes."""
+    global _prefetcher
+    with _prefetcher_lock:
+        if _prefetcher is None:
+            try:
+                workers = int(os.environ.get("LORAS_LOADER_PREFETCH_WORKERS", DEFAULT_PREFETCH_WORKERS))
+            except ValueError:
+                workers = DEFAULT_PREFETCH_WORKERS
+            _prefetcher = LoraPrefetcher(max(1, workers))
+        return _prefetcher
@@ -0,0 +1,112 @@
+import json
+import os
+import threading
+import time
+
+from .instrumentation import logger
+
+# JSON file listing LoRAs to load into the state dict cache when the package
+# is loaded, e.g. {"loras": ["style.safetensors", "detail"], "precision": "fp16"}.
+# Set LORAS_LOADER_PRELOAD_CONFIG to use another file.
+DEFAULT_PRELOAD_CONFIG = os.path.join(os.path.dirname(os.path.realpath(__file__)), "preload.json")
+PRELOAD_OPTIONS = {"loras": [], "lazy": False, "include_clip": True, "precision": "default"}
+
+_status = {"state": "idle", "total": 0, "loaded": 0, "failed": [], "missing": [], "seconds": 0.0}
+_status_lock = threading.Lock()
+_thread = None
+
+
+def read_preload_config(path=None):
+    """Read the preload set. Returns the options, or None if there is no config file."""
+    path = path or os.environ.get("LORAS_LOADER_PRELOAD_CONFIG", DEFAULT_PRELOAD_CONFIG)
+    if not path or not os.path.isfile(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable LoRA preload config %s: %s", path, str(e))
+        return None
+    if not isinstance(data, dict) or not isinstance(data.get("loras", []), list):
+        logger.warning("Ignoring LoRA preload config %s: expected an object with a 'loras' list", path)
+        return None
+    return {key: data.get(key, default) for key, default in PRELOAD_OPTIONS.items()}
+
+
+def _update_status(**changes):
+    with _status_lock:
+        _status.update(changes)
+
+
+def get_preload_status():
+    with _status_lock:
+        return dict(_status, failed=list(_status["failed"]), missing=list(_status["missing"]))
+
+
+def preload_loras(lora_dirs, config):
+    """Warm the LoRA index and load the configured LoRAs into the state dict cache."""
+    from .lora_backend import get_lora_backend
+    from .lora_cache import load_lora_state_dict
+    from .lora_index import resolve_lora_path
+    from .lora_snapshot import get_lora_snapshots
+
+    start = time.perf_counter()
+    names = config["loras"]
+    _update_status(state="scanning", total=len(names), loaded=0, failed=[], missing=[])
+    get_lora_snapshots().refresh(lora_dirs)
+
+    backend = get_lora_backend()
+    if names and backend is not None and not backend.uses_state_dict:
+        logger.info("Not preloading LoRAs, the %s backend doesn't use the state dict cache", backend.name)
+        names = []
+
+    _update_status(state="loading")
+    for i, name in enumerate(names):
+        lora_path = resolve_lora_path(name, lora_dirs)
+        if lora_path is None:
+            logger.warning("Preload: LoRA '%s' not found in any LoRA directories", name)
+            with _status_lock:
+                _status["missing"].append(name)
+            continue
+        try:
+            load_lora_state_dict(lora_path, lazy=config["lazy"], include_clip=config["include_clip"],
+                                 precision=config["precision"], node="preload")
+        except Exception as e:
+            logger.warning("Preload: could not load LoRA '%s': %s", name, str(e))
+            with _status_lock:
+                _status["failed"].append(name)
+            continue
+        with _status_lock:
+            _status["loaded"] += 1
+        logger.info("Preloaded LoRA %d/%d: %s", i + 1, len(names), name)
+
+    seconds = time.perf_counter() - start
+    _update_status(state="done", seconds=seconds)
+    logger.info("LoRA preload finished in %.1f s: %d loaded, %d missing, %d failed", seconds,
+                _status["loaded"], len(_status["missing"]), len(_status["failed"]))
+
+
+def start_preload():
+    """Run the preload in a daemon thread, so server startup never waits for it.
+
+    The LoRA index is warmed even without a preload config. Set
+    LORAS_LOADER_PRELOAD=0 to disable both. Returns the thread, or None.
+    """
+    global _thread
+    if os.environ.get("LORAS_LOADER_PRELOAD", "1").strip() == "0":
+        return None
+
+    def run():
+        try:
+            import folder_paths
+            config = read_preload_config() or dict(PRELOAD_OPTIONS)
+            preload_loras(folder_paths.get_folder_paths("loras"), config)
+        except Exception as e:
+            logger.warning("LoRA preload failed: %s", str(e))
+            _update_status(state="failed")
+
+    if _thread is not None and _thread.is_alive():
+        return _thread
+    _thread = threading.Thread(target=run, name="lora_preload", daemon=True)
+    _thread.start()
+    return _thread
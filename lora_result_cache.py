@@ -0,0 +1,171 @@
+import os
+import threading
+import weakref
+from collections import OrderedDict
+
+from .instrumentation import logger
+
+# Patched (MODEL, CLIP) pairs kept for recently applied LoRAs. The size of an
+# entry is estimated from the LoRA file, since the patches reference its
+# tensors. Set LORAS_LOADER_RESULT_CACHE_SIZE=0 to disable the cache.
+DEFAULT_RESULT_CACHE_SIZE = 8
+DEFAULT_RESULT_CACHE_MB = 512
+
+# A patched clone shares its base model's weights and references the base, so
+# a cached result keeps the whole checkpoint in memory, outside the byte budget.
+# Results are therefore only kept for the most recently used checkpoint:
+# switching checkpoints drops them and releases the old one.
+MAX_BASE_MODELS = 1
+
+
+class PatchedModelCache:
+    """LRU cache of LoRA application results.
+
+    Entries are keyed by the identity of the base MODEL and CLIP objects, the
+    LoRA's content fingerprint, both strengths and the storage precision. Base objects are only
+    referenced weakly by the keys: when one is garbage collected, its entries
+    are dropped, so a new model that reuses the same id() can't hit a stale
+    result. The cached clones do reference their base, so only results for
+    the MAX_BASE_MODELS most recently used checkpoints are kept. Results are
+    grouped by the checkpoint's weights, which all clones share, so chained
+    loaders applied to the same checkpoint don't evict each other's results.
+    """
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # Reentrant, garbage collection can run a weakref callback while it's held
+        self._lock = threading.RLock()
+        self._entries = OrderedDict()  # key -> (result, nbytes)
+        self._checkpoints = OrderedDict()  # checkpoint id -> set of keys, most recent last
+        self._checkpoint_of = {}  # key -> checkpoint id
+        self._watched = {}  # id(base) -> weakref with a callback dropping its entries
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(model, clip, fingerprint, strength_model, strength_clip, precision="default"):
+        return (id(model), id(clip) if clip is not None else None, fingerprint,
+                float(strength_model), float(strength_clip), precision)
+
+    @staticmethod
+    def checkpoint_id(model, clip):
+        """Identity of the weights under a MODEL/CLIP pair, shared by their clones."""
+        return (id(getattr(model, "model", model)) if model is not None else None,
+                id(getattr(clip, "cond_stage_model", clip)) if clip is not None else None)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, model, clip, result, nbytes):
+        if self.max_entries <= 0 or nbytes > self.max_bytes:
+            return
+        with self._lock:
+            for base in (model, clip):
+                if base is not None and not self._watch(base):
+                    # Without a weak reference we couldn't tell when the id is reused
+                    return
+            self._drop([key])
+            checkpoint = self.checkpoint_id(model, clip)
+            self._entries[key] = (result, nbytes)
+            self._bytes += nbytes
+            self._checkpoint_of[key] = checkpoint
+            self._checkpoints.setdefault(checkpoint, set()).add(key)
+            self._checkpoints.move_to_end(checkpoint)
+            while len(self._checkpoints) > MAX_BASE_MODELS:
+                _, keys = next(iter(self._checkpoints.items()))
+                self._drop(list(keys))
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._drop([next(iter(self._entries))])
+                self.evictions += 1
+
+    def _watch(self, base):
+        base_id = id(base)
+        ref = self._watched.get(base_id)
+        if ref is not None and ref() is base:
+            return True
+        try:
+            self._watched[base_id] = weakref.ref(base, lambda _, base_id=base_id: self._invalidate(base_id))
+        except TypeError:
+            return False
+        return True
+
+    def _invalidate(self, base_id):
+        with self._lock:
+            self._watched.pop(base_id, None)
+            self.invalidations += self._drop([key for key in self._entries if base_id in key[:2]])
+
+    def _drop(self, keys):
+        dropped = 0
+        for key in keys:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                continue
+            self._bytes -= entry[1]
+            checkpoint = self._checkpoint_of.pop(key)
+            group = self._checkpoints[checkpoint]
+            group.discard(key)
+            if not group:
+                del self._checkpoints[checkpoint]
+            dropped += 1
+        return dropped
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._checkpoints.clear()
+            self._checkpoint_of.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+def patched_result_nbytes(lora_path):
+    """Memory held by a patched result, estimated as the LoRA's file size."""
+    try:
+        return os.path.getsize(lora_path)
+    except OSError:
+        return 0
+
+
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    """Return the patched result cache shared by all loader nodes."""
+    global _result_cache
+    with _result_cache_lock:
+        if _result_cache is None:
+            try:
+                max_entries = int(os.environ.get("LORAS_LOADER_RESULT_CACHE_SIZE", DEFAULT_RESULT_CACHE_SIZE))
+            except ValueError:
+                max_entries = DEFAULT_RESULT_CACHE_SIZE
+            try:
+                max_mb = float(os.environ.get("LORAS_LOADER_RESULT_CACHE_MB", DEFAULT_RESULT_CACHE_MB))
+            except ValueError:
+                max_mb = DEFAULT_RESULT_CACHE_MB
+            _result_cache = PatchedModelCache(max_entries, int(max_mb * 1024 * 1024))
+            logger.debug("Patched result cache holds up to %d entries and %.0f MB", max_entries, max_mb)
+        return _result_cache
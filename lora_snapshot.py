@@ -0,0 +1,148 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from .instrumentation import logger
+from .lora_index import get_lora_index
+
+# "sorted" lists LoRAs alphabetically. "append" keeps the order LoRAs were
+# first seen in, so new files get new indices instead of shifting existing ones.
+ORDERINGS = ("sorted", "append")
+DEFAULT_ORDERING = "sorted"
+
+# The kept snapshots are saved next to this file, so prompts pinned to an older
+# version and the append order survive a restart. Set LORAS_LOADER_SNAPSHOT_PATH
+# to move it, or to an empty string to keep snapshots in memory only.
+DEFAULT_SNAPSHOT_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), ".lora_snapshot.json")
+
+# Number of past snapshots kept for executions pinned to them
+MAX_SNAPSHOTS = 32
+
+LoraSnapshot = namedtuple("LoraSnapshot", ["version", "names"])
+LoraSnapshot.__doc__ = "Immutable LoRA list. names is a tuple, version increases with every change."
+
+SNAPSHOT_FORMAT = 2
+
+
+class LoraSnapshots:
+    """Versioned, immutable snapshots of the LoRA list.
+
+    Refreshes build a new snapshot and swap it in with a single assignment,
+    so readers never lock and never see a list that changes under them.
+    Versions are at least the current Unix time, so a version number isn't
+    reused for another list after the saved snapshots are lost.
+    """
+
+    def __init__(self, snapshot_path=None, ordering=DEFAULT_ORDERING):
+        self.snapshot_path = snapshot_path
+        self.ordering = ordering
+        self._lock = threading.Lock()  # serializes writers only
+        self._current = LoraSnapshot(0, ())
+        self._history = OrderedDict()  # version -> LoraSnapshot
+        self._loaded = False
+
+    def current(self):
+        self._ensure_loaded()
+        return self._current
+
+    def get(self, version):
+        """Return the snapshot with this version, or None if it's no longer kept."""
+        self._ensure_loaded()
+        return self._history.get(version)
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._load()
+                    self._loaded = True
+
+    def refresh(self, lora_dirs):
+        """Rescan lora_dirs and return the current snapshot, creating a new
+        version only if the LoRA list changed."""
+        names = get_lora_index().refresh(lora_dirs)
+        self._ensure_loaded()
+        with self._lock:
+            current = self._current
+            if self.ordering == "append":
+                present = set(names)
+                known = set(current.names)
+                ordered = [name for name in current.names if name in present]
+                ordered.extend(name for name in names if name not in known)
+                names = tuple(ordered)
+            else:
+                names = tuple(names)
+            if names == current.names and current.version > 0:
+                return current
+
+            snapshot = LoraSnapshot(max(current.version + 1, int(time.time())), names)
+            self._remember(snapshot)
+            self._current = snapshot
+            self._save()
+        logger.debug("LoRA snapshot %d has %d LoRAs", snapshot.version, len(snapshot.names))
+        return snapshot
+
+    def _remember(self, snapshot):
+        self._history[snapshot.version] = snapshot
+        while len(self._history) > MAX_SNAPSHOTS:
+            self._history.popitem(last=False)
+
+    def _load(self):
+        if not self.snapshot_path or not os.path.isfile(self.snapshot_path):
+            return
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("format") == SNAPSHOT_FORMAT:
+                # Names are stored once, snapshots as indices into them
+                names = data["names"]
+                snapshots = [LoraSnapshot(int(version), tuple(names[i] for i in indices))
+                             for version, indices in data["snapshots"]]
+            else:
+                snapshots = [LoraSnapshot(int(data["version"]), tuple(data["names"]))]
+        except (OSError, ValueError, KeyError, TypeError, IndexError) as e:
+            logger.warning("Ignoring unreadable LoRA snapshot %s: %s", self.snapshot_path, str(e))
+            return
+        for snapshot in sorted(snapshots):
+            self._remember(snapshot)
+        if snapshots:
+            self._current = max(snapshots)
+
+    def _save(self):
+        if not self.snapshot_path:
+            return
+        tmp_path = f"{self.snapshot_path}.tmp"
+        positions = {}
+        for snapshot in self._history.values():
+            for name in snapshot.names:
+                positions.setdefault(name, len(positions))
+        data = {
+            "format": SNAPSHOT_FORMAT,
+            "names": list(positions),
+            "snapshots": [[s.version, [positions[name] for name in s.names]] for s in self._history.values()],
+        }
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.snapshot_path)
+        except OSError as e:
+            logger.warning("Could not save LoRA snapshot to %s: %s", self.snapshot_path, str(e))
+
+
+_snapshots = None
+_snapshots_lock = threading.Lock()
+
+
+def get_lora_snapshots():
+    """Return the LoRA list snapshots shared by the index based nodes."""
+    global _snapshots
+    with _snapshots_lock:
+        if _snapshots is None:
+            ordering = os.environ.get("LORAS_LOADER_ORDERING", DEFAULT_ORDERING).strip().lower()
+            if ordering not in ORDERINGS:
+                logger.warning("Unknown LORAS_LOADER_ORDERING '%s', using '%s'", ordering, DEFAULT_ORDERING)
+                ordering = DEFAULT_ORDERING
+            _snapshots = LoraSnapshots(os.environ.get("LORAS_LOADER_SNAPSHOT_PATH", DEFAULT_SNAPSHOT_PATH), ordering)
+        return _snapshots
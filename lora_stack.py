@@ -0,0 +1,218 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import folder_paths
+
+from .lora_backend import apply_lora, lora_content_id
+from .lora_cache import load_lora_state_dict
+from .lora_index import resolve_lora_path
+from .lora_keymap import get_lora_key_maps
+from .lora_precision import PRECISIONS
+from .text_lists import parse_lines
+from .instrumentation import logger, timed, count
+
+MAX_LOAD_WORKERS = 4
+
+
+def parse_lora_stack(text):
+    """Parse 'name:strength_model:strength_clip' lines.
+
+    Strengths are optional: 'name' uses 1.0 for both and 'name:0.8' uses 0.8
+    for both. Returns a list of (name, strength_model, strength_clip).
+    """
+    entries = []
+    for line in parse_lines(text):
+        name = line
+        strengths = []
+        # Peel numeric fields off the end so names may contain ':'
+        while len(strengths) < 2 and ':' in name:
+            head, tail = name.rsplit(':', 1)
+            try:
+                value = float(tail)
+            except ValueError:
+                break
+            strengths.insert(0, value)
+            name = head.strip()
+        strength_model = strengths[0] if strengths else 1.0
+        strength_clip = strengths[1] if len(strengths) > 1 else strength_model
+        entries.append((name, strength_model, strength_clip))
+    return entries
+
+
+def _lora_weights(patch):
+    """Return (up, down, alpha) for a plain LoRA patch, or None for anything else."""
+    if isinstance(patch, tuple):
+        # Older ComfyUI: ("lora", (up, down, alpha, mid, dora_scale, ...))
+        if len(patch) != 2 or patch[0] != "lora":
+            return None
+        weights = patch[1]
+    elif getattr(patch, "name", None) == "lora" and hasattr(patch, "weights"):
+        weights = patch.weights
+    else:
+        return None
+    up, down, alpha = weights[0], weights[1], weights[2]
+    # Tucker (mid), DoRA and reshape patches can't be concatenated
+    if any(w is not None for w in weights[3:]):
+        return None
+    return up, down, alpha
+
+
+def _merge_lora_patches(patches):
+    """Merge plain LoRA patches on the same weight into one of summed rank.
+
+    patches is a list of (patch, strength). Each up matrix is pre-scaled by its
+    strength and alpha/rank, then the ups and downs are concatenated along the
+    rank dimension, so up_cat @ down_cat is the sum of the individual deltas and
+    patching takes a single matmul. Returns None if the patches can't be merged.
+    """
+    ups = []
+    downs = []
+    for patch, strength in patches:
+        weights = _lora_weights(patch)
+        if weights is None:
+            return None
+        up, down, alpha = weights
+        scale = strength * (float(alpha) / down.shape[0] if alpha is not None else 1.0)
+        ups.append(up * scale)
+        downs.append(down)
+
+    if any(u.shape[0] != ups[0].shape[0] or u.shape[2:] != ups[0].shape[2:] for u in ups) or \
+            any(d.shape[1:] != downs[0].shape[1:] for d in downs):
+        return None
+
+    import torch
+    up = torch.cat(ups, dim=1)
+    down = torch.cat(downs, dim=0)
+    # alpha=None makes ComfyUI apply the delta with a scale of 1.0
+    weights = (up, down, None, None, None, None)
+    first = patches[0][0]
+    if isinstance(first, tuple):
+        return ("lora", weights)
+    return type(first)(set(), weights)
+
+
+def _add_stacked_patches(patched, patches_list, presum):
+    """Register every LoRA's patches on an already cloned MODEL or CLIP."""
+    if not presum:
+        for patches, strength in patches_list:
+            patched.add_patches(patches, strength)
+        return patched
+
+    by_key = {}
+    for patches, strength in patches_list:
+        for key, patch in patches.items():
+            by_key.setdefault(key, []).append((patch, strength))
+
+    for key, key_patches in by_key.items():
+        merged = _merge_lora_patches(key_patches) if len(key_patches) > 1 else None
+        if merged is not None:
+            patched.add_patches({key: merged}, 1.0)
+        else:
+            for patch, strength in key_patches:
+                patched.add_patches({key: patch}, strength)
+    return patched
+
+
+def apply_lora_stack(model, clip, state_dicts, presum=False, lora_ids=None, names=None):
+    """Apply several LoRAs in one pass.
+
+    state_dicts is a list of (lora_sd, strength_model, strength_clip). The
+    MODEL and CLIP are each cloned once and all patches are added to the clone.
+    lora_ids identify the LoRAs' contents so their key matching is reused.
+    """
+    key_maps = get_lora_key_maps()
+    model_patches = []
+    clip_patches = []
+    for i, (lora_sd, strength_model, strength_clip) in enumerate(state_dicts):
+        loaded, clip_targets = key_maps.load_patches(lora_sd, model, clip,
+                                                     lora_id=lora_ids[i] if lora_ids else None,
+                                                     name=names[i] if names else "LoRA")
+        model_patches.append(({k: v for k, v in loaded.items() if k not in clip_targets}, strength_model))
+        clip_patches.append(({k: v for k, v in loaded.items() if k in clip_targets}, strength_clip))
+
+    model_out = _add_stacked_patches(model.clone(), model_patches, presum) if model is not None else model
+    clip_out = _add_stacked_patches(clip.clone(), clip_patches, presum) if clip is not None else clip
+    return (model_out, clip_out)
+
+
+class LoRAStackLoader:
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "model": ("MODEL",),
+                "LoRAs": ("STRING", {"multiline": True, "default": "LoRAname1.safetensors:1.0:1.0\nLoRAname2.safetensors:0.8:0.8"}),
+            },
+            "optional": {
+                "clip": ("CLIP",),
+                # Merge LoRAs that patch the same layer into one low-rank delta
+                "presum": ("BOOLEAN", {"default": False}),
+                "lazy_load": ("BOOLEAN", {"default": False}),
+                # Keep LoRA weights in memory as fp16, bf16 or int8 instead of their file dtype
+                "precision": (list(PRECISIONS), {"default": "default"}),
+            }
+        }
+
+    RETURN_TYPES = ("MODEL", "CLIP")
+    FUNCTION = "load_lora_stack"
+    CATEGORY = "loaders"
+
+    def load_lora_stack(self, model, LoRAs, clip=None, presum=False, lazy_load=False, precision="default"):
+        count("LoRAStackLoader", "executions")
+        entries = parse_lora_stack(LoRAs)
+        if len(entries) == 0:
+            logger.warning("No LoRAs provided. Returning model without changes.")
+            return (model, clip)
+
+        lora_dirs = folder_paths.get_folder_paths("loras")
+        resolved = []
+        with timed("LoRAStackLoader", "resolve"):
+            for name, strength_model, strength_clip in entries:
+                lora_path = resolve_lora_path(name, lora_dirs)
+                if lora_path is None:
+                    logger.warning("LoRA file '%s' not found in any LoRA directories. Skipping it.", name)
+                    continue
+                if strength_model == 0 and strength_clip == 0:
+                    continue
+                resolved.append((name, lora_path, strength_model, strength_clip))
+
+        if len(resolved) == 0:
+            return (model, clip)
+
+        logger.debug("Loading %d LoRAs: %s", len(resolved), ", ".join(
+            f"{name} ({strength_model}, {strength_clip})" for name, _, strength_model, strength_clip in resolved))
+
+        # Read all files concurrently, then merge their patches in one step
+        try:
+            with timed("LoRAStackLoader", "read"), \
+                    ThreadPoolExecutor(max_workers=min(MAX_LOAD_WORKERS, len(resolved))) as pool:
+                state_dicts = list(pool.map(
+                    lambda entry: load_lora_state_dict(entry[1], lazy=lazy_load, include_clip=clip is not None,
+                                                       precision=precision, node="LoRAStackLoader"),
+                    resolved))
+            with timed("LoRAStackLoader", "apply"):
+                return apply_lora_stack(model, clip, [
+                    (lora_sd, strength_model, strength_clip)
+                    for lora_sd, (_, _, strength_model, strength_clip) in zip(state_dicts, resolved)
+                ], presum=presum,
+                    lora_ids=[lora_content_id(lora_path, lazy_load, clip is not None) for _, lora_path, _, _ in resolved],
+                    names=[name for name, _, _, _ in resolved])
+        except Exception as e:
+            logger.warning("Error applying LoRA stack in one pass, applying LoRAs one by one: %s", str(e))
+
+        # Fall back to chaining the regular single LoRA path
+        for name, lora_path, strength_model, strength_clip in resolved:
+            try:
+                model, clip = apply_lora(model, clip, name, lora_path, strength_model, strength_clip, lazy=lazy_load,
+                                         precision=precision, node="LoRAStackLoader")
+            except Exception as e:
+                logger.error("Error loading or applying LoRA %s: %s", name, str(e))
+        return (model, clip)
+
+
+NODE_CLASS_MAPPINGS = {
+    "LoRAStackLoader": LoRAStackLoader
+}
+
+NODE_DISPLAY_NAME_MAPPINGS = {
+    "LoRAStackLoader": "LoRA Stack Loader"
+}
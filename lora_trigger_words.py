@@ -0,0 +1,72 @@
+import folder_paths
+
+from .instrumentation import logger, timed, count
+from .lora_index import resolve_lora_path
+from .lora_metadata import get_lora_metadata_index, trigger_words
+from .lora_snapshot import get_lora_snapshots
+from .text_lists import parse_lines
+
+
+class LoRATriggerWords:
+    """Returns trigger words stored in a LoRA's safetensors metadata."""
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "index": ("INT", {"default": 0, "min": 0, "max": 99999, "step": 1}),
+                # Leave empty to index the LoRA folder in the same order as LoRA Loader (by Index)
+                "LoRAnames": ("STRING", {"multiline": True, "default": ""}),
+                "top_k": ("INT", {"default": 5, "min": 1, "max": 100, "step": 1}),
+                "separator": ("STRING", {"default": ", "}),
+            },
+            "optional": {
+                # Overrides the index selection when connected
+                "lora_name": ("STRING", {"forceInput": True}),
+            }
+        }
+
+    RETURN_TYPES = ("STRING",)
+    RETURN_NAMES = ("triggers",)
+    FUNCTION = "get_trigger_words"
+    CATEGORY = "utils"
+
+    def get_trigger_words(self, index, LoRAnames, top_k, separator, lora_name=None):
+        count("LoRATriggerWords", "executions")
+        lora_dirs = folder_paths.get_folder_paths("loras")
+
+        if not lora_name:
+            names = parse_lines(LoRAnames)
+            if len(names) == 0:
+                with timed("LoRATriggerWords", "scan"):
+                    names = get_lora_snapshots().refresh(lora_dirs).names
+            if len(names) == 0:
+                logger.warning("No LoRAs found. Returning empty string.")
+                return ("",)
+            if index < 0 or index >= len(names):
+                logger.warning("LoRA index %d out of range. Using default index 0.", index)
+                index = 0
+            lora_name = names[index]
+
+        with timed("LoRATriggerWords", "resolve"):
+            lora_path = resolve_lora_path(lora_name, lora_dirs)
+        if lora_path is None:
+            logger.warning("LoRA file '%s' not found in any LoRA directories. Returning empty string.", lora_name)
+            return ("",)
+
+        with timed("LoRATriggerWords", "read"):
+            metadata = get_lora_metadata_index().get(lora_path)
+        words = trigger_words(metadata, top_k)
+        if not words:
+            count("LoRATriggerWords", "no_metadata")
+            logger.debug("LoRA %s has no trigger word metadata", lora_name)
+        return (separator.join(words),)
+
+
+NODE_CLASS_MAPPINGS = {
+    "LoRATriggerWords": LoRATriggerWords
+}
+
+NODE_DISPLAY_NAME_MAPPINGS = {
+    "LoRATriggerWords": "LoRA Trigger Words (from Metadata)"
+}
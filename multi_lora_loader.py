@@ -1,41 +1,43 @@
-import os
 import folder_paths
-import torch
+from .lora_index import resolve_lora_path
+from .lora_precision import PRECISIONS
+from .lora_snapshot import MAX_SNAPSHOTS, get_lora_snapshots
+from .lora_backend import apply_lora
+from .lora_prefetch import get_lora_prefetcher, prefetch_following
+from .instrumentation import logger, timed, count
 
 class MultiLoraLoader:
-    # Class variable to store LoRA list
-    all_loras = []
-    
     @classmethod
     def INPUT_TYPES(cls):
-        # Get all available lora directories and gather all lora files
-        cls.all_loras = []
+        # Get all available lora directories and gather all lora files.
+        # The shared index only rescans directories that changed since the last call.
         lora_dirs = folder_paths.get_folder_paths("loras")
+        with timed("MultiLoraLoader", "scan"):
+            snapshot = get_lora_snapshots().refresh(lora_dirs)
+        all_loras = list(snapshot.names)
         
-        for lora_dir in lora_dirs:
-            if os.path.isdir(lora_dir):
-                for filename in os.listdir(lora_dir):
-                    if filename.endswith(('.safetensors', '.ckpt', '.pt')):
-                        cls.all_loras.append(filename)
+        logger.debug("Found %d LoRA files in %d directories (snapshot %d)", len(all_loras), len(lora_dirs),
+                     snapshot.version)
         
-        # Sort and remove duplicates
-        cls.all_loras = sorted(list(set(cls.all_loras)))
-        
-        # Print debug info
-        print(f"Found {len(cls.all_loras)} LoRA files in {len(lora_dirs)} directories")
-        
-        max_index = max(0, len(cls.all_loras) - 1)
+        max_index = max(0, len(all_loras) - 1)
         
         return {
             "required": {
                 "model": ("MODEL",),
                 "index": ("INT", {"default": 0, "min": 0, "max": max_index, "step": 1}),
-                "lora_list": (cls.all_loras, {"default": cls.all_loras[0] if cls.all_loras else ""}),
+                "lora_list": (all_loras, {"default": all_loras[0] if all_loras else ""}),
                 "strength_model": ("FLOAT", {"default": 1.0, "min": -10.0, "max": 10.0, "step": 0.01}),
                 "strength_clip": ("FLOAT", {"default": 1.0, "min": -10.0, "max": 10.0, "step": 0.01}),
             },
             "optional": {
                 "clip": ("CLIP", ),
+                "lazy_load": ("BOOLEAN", {"default": False}),
+                # Number of following LoRAs to load in the background, 0 disables prefetching
+                "prefetch": ("INT", {"default": 0, "min": 0, "max": 16, "step": 1}),
+                # Version of the LoRA list the index refers to, 0 uses the latest list
+                "snapshot": ("INT", {"default": snapshot.version, "min": 0, "max": 0xffffffffffff, "step": 1}),
+                # Keep LoRA weights in memory as fp16, bf16 or int8 instead of their file dtype
+                "precision": (list(PRECISIONS), {"default": "default"}),
             }
         }
 
@@ -43,105 +45,69 @@ class MultiLoraLoader:
     FUNCTION = "load_lora"
     CATEGORY = "loaders"
 
-    def load_lora(self, model, index, lora_list, strength_model, strength_clip, clip=None):
+    def load_lora(self, model, index, lora_list, strength_model, strength_clip, clip=None, lazy_load=False, prefetch=0,
+                  snapshot=0, precision="default"):
+        count("MultiLoraLoader", "executions")
         lora_dirs = folder_paths.get_folder_paths("loras")
         
-        # Use the class variable to access the LoRA list
-        all_loras = self.__class__.all_loras
+        # Use the LoRA list the prompt was built against, so files added since
+        # then can't shift the index to another LoRA
+        snapshots = get_lora_snapshots()
+        pinned = snapshots.get(snapshot) if snapshot > 0 else None
+        if pinned is None and snapshot > 0:
+            # The index may point at a different LoRA in any other list, and
+            # rendering without the LoRA would go unnoticed, so fail the prompt
+            count("MultiLoraLoader", "missing_snapshots")
+            raise RuntimeError(
+                f"LoRA list snapshot {snapshot} is not available on this server (it is older than the last "
+                f"{MAX_SNAPSHOTS} list changes or was made elsewhere). Set snapshot to "
+                f"{snapshots.refresh(lora_dirs).version} to use the current list, or to 0 to always use the latest list.")
+        if pinned is None:
+            pinned = snapshots.current()
+            if pinned.version == 0:
+                pinned = snapshots.refresh(lora_dirs)
+        all_loras = pinned.names
         
         # Validate we have LoRAs and index is in range
         if len(all_loras) == 0:
-            print("No LoRAs found. Returning model without changes.")
+            logger.warning("No LoRAs found. Returning model without changes.")
             return (model, clip)
             
         if index < 0 or index >= len(all_loras):
-            print(f"LoRA index {index} out of range (0-{len(all_loras)-1}). Using index 0.")
+            logger.warning("LoRA index %d out of range (0-%d). Using index 0.", index, len(all_loras) - 1)
             index = 0
         
         # Get the LoRA file name based on index
         lora_name = all_loras[index]
         
         # Find the LoRA file in any of the lora directories
-        lora_path = None
-        for lora_dir in lora_dirs:
-            potential_path = os.path.join(lora_dir, lora_name)
-            if os.path.isfile(potential_path):
-                lora_path = potential_path
-                break
+        with timed("MultiLoraLoader", "resolve"):
+            lora_path = resolve_lora_path(lora_name, lora_dirs)
                 
         # If we couldn't find the file
         if lora_path is None:
-            print(f"LoRA file '{lora_name}' not found in any LoRA directories. Returning model without changes.")
+            logger.warning("LoRA file '%s' not found in any LoRA directories. Returning model without changes.", lora_name)
             return (model, clip)
             
-        print(f"Loading LoRA {lora_name} (index {index}/{len(all_loras)-1}) from {lora_path}")
-        print(f"Model strength: {strength_model}, Clip strength: {strength_clip}")
-        
-        # Import the reference implementation from ComfyUI's nodes
-        try:
-            import importlib.util
-            import sys
-            
-            # Get the ComfyUI nodes directory
-            script_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
-            comfy_dir = os.path.join(script_dir, "comfy")
-            nodes_dir = os.path.join(script_dir, "comfy_extras")
-            
-            if os.path.exists(os.path.join(comfy_dir, "sd.py")) and os.path.exists(os.path.join(nodes_dir, "nodes_lora.py")):
-                # Load the lora module directly from ComfyUI
-                spec = importlib.util.spec_from_file_location("nodes_lora", os.path.join(nodes_dir, "nodes_lora.py"))
-                nodes_lora = importlib.util.module_from_spec(spec)
-                sys.modules["nodes_lora"] = nodes_lora
-                spec.loader.exec_module(nodes_lora)
-                
-                # Use the reference implementation
-                lora_loader = nodes_lora.LoraLoader()
-                return lora_loader.load_lora(model, lora_path, strength_model, strength_clip, clip)
-            else:
-                print("Could not find ComfyUI's nodes_lora.py, falling back to internal implementation")
-                
-        except Exception as e:
-            print(f"Error loading ComfyUI's LoraLoader: {str(e)}")
+        logger.debug("Loading LoRA %s (index %d/%d) from %s, model strength %s, clip strength %s",
+                     lora_name, index, len(all_loras) - 1, lora_path, strength_model, strength_clip)
         
-        # If we couldn't use the reference implementation, use our own
+        # Start reading the next LoRAs of the sweep while this one is applied
+        if prefetch > 0:
+            get_lora_prefetcher().claim(lora_path, lazy=lazy_load, include_clip=clip is not None, precision=precision)
+            prefetch_following(all_loras, index, prefetch, lora_dirs, lazy=lazy_load, include_clip=clip is not None,
+                               precision=precision, owner=self)
+
+        # Apply the LoRA with the backend probed once on first use
         try:
-            import comfy.utils
-            
-            # Load the LoRA file
-            lora_sd = comfy.utils.load_torch_file(lora_path)
-            
-            # We need to import these from comfy's sd module
-            import comfy.sd as sd
-            
-            # Apply the LoRA
-            if hasattr(sd, 'load_lora_for_models'):
-                return sd.load_lora_for_models(model, clip, lora_sd, strength_model, strength_clip)
-            else:
-                model_result = model
-                clip_result = clip
-                
-                if hasattr(sd, 'apply_weighted_lora'):
-                    # Newer ComfyUI versions
-                    if model is not None:
-                        model_result = sd.apply_weighted_lora(model, lora_sd, strength_model)
-                    if clip is not None:
-                        clip_result = sd.apply_weighted_lora(clip, lora_sd, strength_clip)
-                elif hasattr(sd, 'apply_lora'):
-                    # Older ComfyUI versions
-                    if model is not None:
-                        model_result = sd.apply_lora(model, lora_sd, strength_model)
-                    if clip is not None:
-                        clip_result = sd.apply_lora(clip, lora_sd, strength_clip)
-                else:
-                    print("Could not find apply_lora or apply_weighted_lora in ComfyUI's sd module")
-                
-                return (model_result, clip_result)
-                
+            return apply_lora(model, clip, lora_name, lora_path, strength_model, strength_clip, lazy=lazy_load,
+                              precision=precision, node="MultiLoraLoader")
         except Exception as e:
-            print(f"Error loading or applying LoRA: {str(e)}")
+            logger.error("Error loading or applying LoRA: %s", str(e))
             
         # If all else fails, return the original models
-        print("All LoRA loading methods failed, returning original model")
+        count("MultiLoraLoader", "failures")
+        logger.error("All LoRA loading methods failed, returning original model")
         return (model, clip)
 
 # Add the node to ComfyUI
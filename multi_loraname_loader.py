@@ -1,5 +1,7 @@
 import os
 import folder_paths
+from .instrumentation import logger, count
+from .text_lists import parse_lines, parse_index_spec
 
 class MultiLoRAnameLoader:
     @classmethod
@@ -17,16 +19,17 @@ class MultiLoRAnameLoader:
     CATEGORY = "utils"
 
     def get_LoRAname_by_index(self, index, LoRAnames):
+        count("MultiLoRAnameLoader", "executions")
         # Split the LoRAnames into lines and remove empty lines
-        LoRAname_lines = [line.strip() for line in LoRAnames.split('\n') if line.strip()]
+        LoRAname_lines = parse_lines(LoRAnames)
         
         # Validate index
         if len(LoRAname_lines) == 0:
-            print("No LoRAname provided. Returning empty string.")
+            logger.warning("No LoRAname provided. Returning empty string.")
             return ("",)
             
         if index < 0 or index >= len(LoRAname_lines):
-            print(f"LoRAname index {index} out of range. Using default index 0.")
+            logger.warning("LoRAname index %d out of range. Using default index 0.", index)
             index = 0 if len(LoRAname_lines) > 0 else -1
             
         if index == -1:
@@ -34,14 +37,45 @@ class MultiLoRAnameLoader:
             
         # Get the selected LoRAname
         selected_LoRAname = LoRAname_lines[index]
-        print(f"Selected LoRAname at index {index}: '{selected_LoRAname}'")
+        logger.debug("Selected LoRAname at index %d: '%s'", index, selected_LoRAname)
                 
         return (selected_LoRAname,)
 
+class MultiLoRAnameListLoader:
+    """Returns the LoRA names at several indices as a list, so one prompt sweeps them all."""
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "indices": ("STRING", {"default": "all"}),
+                "LoRAnames": ("STRING", {"multiline": True, "default": "LoRAname1.safetensors\nLoRAname2.safetensors\nLoRAname3.safetensors"}),
+            }
+        }
+
+    RETURN_TYPES = ("STRING", "INT")
+    RETURN_NAMES = ("lora_name", "index")
+    OUTPUT_IS_LIST = (True, True)
+    FUNCTION = "get_LoRAnames_by_indices"
+    CATEGORY = "utils"
+
+    def get_LoRAnames_by_indices(self, indices, LoRAnames):
+        count("MultiLoRAnameListLoader", "executions")
+        LoRAname_lines = parse_lines(LoRAnames)
+        if len(LoRAname_lines) == 0:
+            logger.warning("No LoRAname provided. Returning empty list.")
+            return ([], [])
+
+        selected = list(parse_index_spec(indices, len(LoRAname_lines)))
+        logger.debug("Selected %d LoRAnames at indices %s", len(selected), selected)
+        return ([LoRAname_lines[i] for i in selected], selected)
+
 NODE_CLASS_MAPPINGS = {
-    "MultiLoRAnameLoader": MultiLoRAnameLoader
+    "MultiLoRAnameLoader": MultiLoRAnameLoader,
+    "MultiLoRAnameListLoader": MultiLoRAnameListLoader
 }
 
 NODE_DISPLAY_NAME_MAPPINGS = {
-    "MultiLoRAnameLoader": "LoRAname (by Index)"
+    "MultiLoRAnameLoader": "LoRAname (by Index)",
+    "MultiLoRAnameListLoader": "LoRAname (by Index List)"
 } 
\ No newline at end of file
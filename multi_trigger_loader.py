@@ -1,5 +1,7 @@
 import os
 import re
+from .instrumentation import logger, count
+from .text_lists import parse_lines, parse_index_spec
 
 class MultiTriggerLoader:
     @classmethod
@@ -16,33 +18,65 @@ class MultiTriggerLoader:
     CATEGORY = "utils"
 
     def get_trigger_by_index(self, index, triggers):
+        count("MultiTriggerLoader", "executions")
         # Split the triggers into lines and remove empty lines
-        trigger_lines = [line.strip() for line in triggers.split('\n') if line.strip()]
+        trigger_lines = parse_lines(triggers)
         
         # Validate index
         if len(trigger_lines) == 0:
-            print("No trigger words provided. Returning empty string.")
+            logger.warning("No trigger words provided. Returning empty string.")
             return ("",)
             
         if index == -1:
             return ("",)
         
         if index < 0 or index >= len(trigger_lines):
-            print(f"Trigger index {index} out of range. Using default index 0.")
+            logger.warning("Trigger index %d out of range. Using default index 0.", index)
             index = 0
             
             
         # Get the selected trigger
         selected_trigger = trigger_lines[index]
-        print(f"Selected trigger word at index {index}: '{selected_trigger}'")
+        logger.debug("Selected trigger word at index %d: '%s'", index, selected_trigger)
                 
         return (selected_trigger,)
 
+class MultiTriggerListLoader:
+    """Returns the triggers at several indices as a list, so one prompt sweeps them all."""
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "indices": ("STRING", {"default": "all"}),
+                "triggers": ("STRING", {"multiline": True, "default": "trigger word 1\ntrigger word 2\ntrigger word 3"}),
+            }
+        }
+
+    RETURN_TYPES = ("STRING", "INT")
+    RETURN_NAMES = ("trigger", "index")
+    OUTPUT_IS_LIST = (True, True)
+    FUNCTION = "get_triggers_by_indices"
+    CATEGORY = "utils"
+
+    def get_triggers_by_indices(self, indices, triggers):
+        count("MultiTriggerListLoader", "executions")
+        trigger_lines = parse_lines(triggers)
+        if len(trigger_lines) == 0:
+            logger.warning("No trigger words provided. Returning empty list.")
+            return ([], [])
+
+        selected = list(parse_index_spec(indices, len(trigger_lines)))
+        logger.debug("Selected %d trigger words at indices %s", len(selected), selected)
+        return ([trigger_lines[i] for i in selected], selected)
+
 # Add the node to ComfyUI
 NODE_CLASS_MAPPINGS = {
-    "MultiTriggerLoader": MultiTriggerLoader
+    "MultiTriggerLoader": MultiTriggerLoader,
+    "MultiTriggerListLoader": MultiTriggerListLoader
 }
 
 NODE_DISPLAY_NAME_MAPPINGS = {
-    "MultiTriggerLoader": "Trigger Words (by Index)"
+    "MultiTriggerLoader": "Trigger Words (by Index)",
+    "MultiTriggerListLoader": "Trigger Words (by Index List)"
 } 
\ No newline at end of file
@@ -0,0 +1,95 @@
+import json
+
+from .instrumentation import logger, count
+from .text_lists import parse_lines, parse_float_spec
+
+
+def plan_sweep(lora_names, strengths_model, strengths_clip, triggers):
+    """Order a LoRA x strength_model x strength_clip x trigger grid for execution.
+
+    The LoRA is the outermost loop and repeated names are grouped with their
+    first occurrence, so every distinct LoRA is loaded once and all of its
+    combinations run back to back. Returns a list of (lora, strength_model,
+    strength_clip, trigger) coordinate tuples into the input lists.
+    """
+    groups = {}
+    for i, name in enumerate(lora_names):
+        groups.setdefault(name, []).append(i)
+
+    runs = []
+    for indices in groups.values():
+        for lora in indices:
+            for sm in range(len(strengths_model)):
+                for sc in range(len(strengths_clip)):
+                    for trigger in range(len(triggers)):
+                        runs.append((lora, sm, sc, trigger))
+    return runs
+
+
+class LoRASweepPlanner:
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "LoRAnames": ("STRING", {"multiline": True, "default": "LoRAname1.safetensors\nLoRAname2.safetensors\nLoRAname3.safetensors"}),
+                # Comma separated values or start:stop:step ranges
+                "strengths_model": ("STRING", {"default": "1.0"}),
+                "strengths_clip": ("STRING", {"default": "1.0"}),
+            },
+            "optional": {
+                "triggers": ("STRING", {"multiline": True, "default": ""}),
+            }
+        }
+
+    RETURN_TYPES = ("STRING", "INT", "FLOAT", "FLOAT", "STRING", "INT", "STRING")
+    RETURN_NAMES = ("lora_name", "lora_index", "strength_model", "strength_clip", "trigger", "run_index", "manifest")
+    OUTPUT_IS_LIST = (True, True, True, True, True, True, False)
+    FUNCTION = "plan"
+    CATEGORY = "utils"
+
+    def plan(self, LoRAnames, strengths_model, strengths_clip, triggers=""):
+        count("LoRASweepPlanner", "executions")
+        lora_names = parse_lines(LoRAnames)
+        values_model = parse_float_spec(strengths_model) or (1.0,)
+        values_clip = parse_float_spec(strengths_clip) or (1.0,)
+        # Without triggers the grid has a single empty trigger
+        trigger_lines = parse_lines(triggers) or ("",)
+
+        if len(lora_names) == 0:
+            logger.warning("No LoRAname provided. Returning an empty sweep.")
+            return ([], [], [], [], [], [], json.dumps({"runs": []}))
+
+        runs = plan_sweep(lora_names, values_model, values_clip, trigger_lines)
+        logger.debug("Planned %d runs over %d LoRAs", len(runs), len(set(lora_names)))
+
+        # The manifest maps every run back to its grid coordinates
+        manifest = {
+            "axes": {
+                "lora": list(lora_names),
+                "strength_model": list(values_model),
+                "strength_clip": list(values_clip),
+                "trigger": list(trigger_lines),
+            },
+            "runs": [
+                {"run": i, "lora": lora, "strength_model": sm, "strength_clip": sc, "trigger": trigger}
+                for i, (lora, sm, sc, trigger) in enumerate(runs)
+            ],
+        }
+        return (
+            [lora_names[lora] for lora, _, _, _ in runs],
+            [lora for lora, _, _, _ in runs],
+            [values_model[sm] for _, sm, _, _ in runs],
+            [values_clip[sc] for _, _, sc, _ in runs],
+            [trigger_lines[trigger] for _, _, _, trigger in runs],
+            list(range(len(runs))),
+            json.dumps(manifest),
+        )
+
+
+NODE_CLASS_MAPPINGS = {
+    "LoRASweepPlanner": LoRASweepPlanner
+}
+
+NODE_DISPLAY_NAME_MAPPINGS = {
+    "LoRASweepPlanner": "LoRA Sweep Planner"
+}
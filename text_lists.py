@@ -0,0 +1,83 @@
+import re
+from functools import lru_cache
+
+from .instrumentation import logger
+
+
+@lru_cache(maxsize=128)
+def parse_lines(text):
+    """Split a multiline input into stripped, non-empty lines.
+
+    Results are memoized on the text, so nodes executed again with the same
+    input don't split it again. Returns a tuple, which callers must not modify.
+    """
+    return tuple(line.strip() for line in text.split('\n') if line.strip())
+
+
+_RANGE = re.compile(r"^(\d+)\s*-\s*(\d+)$")
+
+
+@lru_cache(maxsize=128)
+def parse_index_spec(spec, length):
+    """Parse an index list like '0-4, 7 9' into indices below length.
+
+    Items are single indices or inclusive ranges separated by commas or
+    whitespace. An empty spec or 'all' selects every index.
+    """
+    spec = spec.strip()
+    if spec == "" or spec.lower() == "all":
+        return tuple(range(length))
+
+    indices = []
+    skipped = 0
+    for item in _split_items(spec):
+        match = _RANGE.match(item)
+        if match:
+            start, end = int(match.group(1)), int(match.group(2))
+        elif item.isdigit():
+            start = end = int(item)
+        else:
+            logger.warning("Ignoring invalid index '%s'", item)
+            continue
+        # Clamp to the list so huge ranges don't expand to huge lists
+        low, high = min(start, end), max(start, end)
+        skipped += max(0, high - max(low, length) + 1)
+        high = min(high, length - 1)
+        if low <= high:
+            selected = range(low, high + 1)
+            indices.extend(selected if start <= end else reversed(selected))
+    if skipped:
+        logger.warning("Skipped %d indices out of range (0-%d) in '%s'", skipped, length - 1, spec)
+    return tuple(indices)
+
+
+def _split_items(spec):
+    # Normalize 'a - b' to 'a-b' so ranges survive splitting on whitespace
+    spec = re.sub(r"\s*-\s*", "-", spec)
+    return [item for item in re.split(r"[,\s]+", spec) if item]
+
+
+@lru_cache(maxsize=128)
+def parse_float_spec(spec):
+    """Parse a value list like '0.5, 1.0' or a range like '0.25:1.0:0.25'.
+
+    Ranges are start:stop:step with stop included. Returns a tuple of floats.
+    """
+    values = []
+    for item in [item.strip() for item in spec.split(',') if item.strip()]:
+        parts = item.split(':')
+        try:
+            if len(parts) == 1:
+                values.append(float(parts[0]))
+                continue
+            if len(parts) != 3:
+                raise ValueError("expected start:stop:step")
+            start, stop, step = (float(p) for p in parts)
+            if step == 0 or (stop - start) / step < 0:
+                raise ValueError("step doesn't move from start to stop")
+        except ValueError as e:
+            logger.warning("Ignoring invalid value '%s': %s", item, str(e))
+            continue
+        steps = int(round((stop - start) / step, 9))
+        values.extend(round(start + i * step, 6) for i in range(steps + 1))
+    return tuple(values)
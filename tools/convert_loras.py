@@ -0,0 +1,156 @@
+"""Convert LoRA files to compact fp16, bf16 or int8 safetensors and report the
+accuracy lost by the conversion. Runs on CPU.
+
+    python tools/convert_loras.py /path/to/loras /path/to/compact --precision fp16
+    python tools/convert_loras.py /path/to/loras --precision int8 --report-only --json report.json
+
+fp16 and bf16 files are ordinary LoRAs that any loader can read. int8 files
+store a scale next to every weight matrix and can only be loaded by the nodes
+of this package, which dequantize them when the LoRA is applied.
+
+For every file the report lists the size before and after, the largest
+relative error of a single tensor and the largest relative error of a
+reconstructed up @ down weight delta, which is what the model actually sees.
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+import package  # noqa: E402
+
+# Suffixes of the up/down halves of a LoRA pair in the kohya, ComfyUI and
+# diffusers/peft naming schemes
+PAIR_SUFFIXES = (
+    (".lora_up.weight", ".lora_down.weight"),
+    (".lora.up.weight", ".lora.down.weight"),
+    (".lora_B.weight", ".lora_A.weight"),
+)
+
+
+def find_loras(source):
+    if os.path.isfile(source):
+        return [(os.path.basename(source), source)]
+    found = []
+    for dirpath, dirnames, filenames in os.walk(source):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.endswith(".safetensors"):
+                path = os.path.join(dirpath, filename)
+                found.append((os.path.relpath(path, source), path))
+    return found
+
+
+def relative_error(reference, approximation):
+    norm = reference.norm().item()
+    if norm == 0:
+        return 0.0
+    return (reference - approximation).norm().item() / norm
+
+
+def lora_pairs(keys):
+    for key in keys:
+        for up_suffix, down_suffix in PAIR_SUFFIXES:
+            if key.endswith(up_suffix):
+                down = key[:-len(up_suffix)] + down_suffix
+                if down in keys:
+                    yield key, down
+
+
+def weight_delta(up, down):
+    return up.reshape(up.shape[0], -1) @ down.reshape(down.shape[0], -1)
+
+
+def convert_file(path, out_path, precision):
+    import torch
+
+    lazy_safetensors = package.import_module("lazy_safetensors")
+    lora_precision = package.import_module("lora_precision")
+
+    original = lazy_safetensors.LazySafetensors(path)
+    tensors = {key: original[key] for key in original}
+    packed = lora_precision.pack_state_dict(tensors, precision)
+    format_metadata = lora_precision.packed_metadata(tensors, precision)
+    if precision == "int8":
+        dtype = getattr(torch, format_metadata[lora_precision.DTYPE_METADATA_KEY])
+        restored = lora_precision.QuantizedStateDict.from_packed(packed, dtype)
+    else:
+        restored = packed
+
+    report = {
+        "bytes_before": sum(t.numel() * t.element_size() for t in tensors.values()),
+        "bytes_after": sum(t.numel() * t.element_size() for t in packed.values()),
+        "max_tensor_error": 0.0,
+        "max_delta_error": 0.0,
+        "worst_tensor": None,
+    }
+    for key, tensor in tensors.items():
+        if not tensor.is_floating_point():
+            continue
+        error = relative_error(tensor.to(torch.float32), restored[key].to(torch.float32))
+        if error > report["max_tensor_error"]:
+            report["max_tensor_error"] = error
+            report["worst_tensor"] = key
+    for up, down in lora_pairs(set(tensors)):
+        reference = weight_delta(tensors[up].to(torch.float32), tensors[down].to(torch.float32))
+        approximation = weight_delta(restored[up].to(torch.float32), restored[down].to(torch.float32))
+        report["max_delta_error"] = max(report["max_delta_error"], relative_error(reference, approximation))
+
+    if out_path is not None:
+        from safetensors.torch import save_file
+        os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+        metadata = dict(original.metadata)
+        metadata.update(format_metadata)
+        # Copy out of the memory map, safetensors needs contiguous, unshared tensors
+        save_file({key: t.contiguous().clone() for key, t in packed.items()}, out_path, metadata=metadata)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="LoRA directory or file")
+    parser.add_argument("output", nargs="?", help="directory for the converted files")
+    parser.add_argument("--precision", choices=("fp16", "bf16", "int8"), default="fp16")
+    parser.add_argument("--report-only", action="store_true", help="measure the accuracy loss without writing files")
+    parser.add_argument("--overwrite", action="store_true", help="replace existing files in the output directory")
+    parser.add_argument("--json", help="write the report as JSON to this file")
+    args = parser.parse_args()
+
+    if args.output is None and not args.report_only:
+        parser.error("an output directory is required unless --report-only is given")
+    if args.output is not None and os.path.realpath(args.output) == os.path.realpath(args.source):
+        parser.error("the output directory must differ from the source")
+
+    results = {}
+    failures = 0
+    total_before = total_after = 0
+    for name, path in find_loras(args.source):
+        out_path = None if args.report_only else os.path.join(args.output, name)
+        if out_path is not None and os.path.exists(out_path) and not args.overwrite:
+            print(f"{name}: skipped, {out_path} exists")
+            continue
+        try:
+            report = convert_file(path, out_path, args.precision)
+        except Exception as e:
+            print(f"{name}: failed: {e}")
+            failures += 1
+            continue
+        results[name] = report
+        total_before += report["bytes_before"]
+        total_after += report["bytes_after"]
+        print(f"{name}: {report['bytes_before'] / 2**20:.1f} MB -> {report['bytes_after'] / 2**20:.1f} MB, "
+              f"max tensor error {report['max_tensor_error']:.2e}, max delta error {report['max_delta_error']:.2e}")
+
+    if results:
+        print(f"\n{len(results)} files: {total_before / 2**20:.1f} MB -> {total_after / 2**20:.1f} MB "
+              f"({args.precision}), worst delta error "
+              f"{max(r['max_delta_error'] for r in results.values()):.2e}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"precision": args.precision, "files": results}, f, indent=2)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,20 @@
+"""Import this repository's modules from command line tools.
+
+The repository is loaded as the loras_loader package without running its
+__init__, so tools don't need a ComfyUI install for modules that don't use it.
+"""
+import importlib
+import importlib.util
+import os
+import sys
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+PACKAGE_NAME = "loras_loader"
+
+
+def import_module(name):
+    if PACKAGE_NAME not in sys.modules:
+        spec = importlib.util.spec_from_file_location(
+            PACKAGE_NAME, os.path.join(PACKAGE_DIR, "__init__.py"), submodule_search_locations=[PACKAGE_DIR])
+        sys.modules[PACKAGE_NAME] = importlib.util.module_from_spec(spec)
+    return importlib.import_module(f"{PACKAGE_NAME}.{name}")
@@ -0,0 +1,78 @@
+"""Build the LoRA directory index, list snapshot and metadata index offline,
+so the first workflow after a server restart doesn't pay for a cold scan.
+
+    python tools/warmup.py /path/to/loras /path/to/more_loras
+    python tools/warmup.py --comfyui /path/to/ComfyUI --fingerprints
+
+The indexes are written to the same sidecar files the nodes use, so set the
+same LORAS_LOADER_* environment variables as the server. Without --comfyui,
+LoRAs are listed with ComfyUI's default file extensions; use --comfyui if the
+server registers other extensions for the loras folder. The LoRAs named in
+the preload config are checked and missing ones are reported.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+import package  # noqa: E402
+
+
+def comfyui_lora_dirs(comfyui_path):
+    sys.path.insert(0, os.path.realpath(comfyui_path))
+    import folder_paths
+    return folder_paths.get_folder_paths("loras")
+
+
+def step(label, function, *args):
+    print(f"{label}...", flush=True)
+    start = time.perf_counter()
+    result = function(*args)
+    print(f"{label}: done in {time.perf_counter() - start:.2f} s", flush=True)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("lora_dirs", nargs="*", help="LoRA directories")
+    parser.add_argument("--comfyui", help="ComfyUI directory, to use its configured LoRA directories")
+    parser.add_argument("--fingerprints", action="store_true",
+                        help="also compute content fingerprints, used by the caches and duplicate detection")
+    parser.add_argument("--preload-config", help="preload config to check instead of the default one")
+    args = parser.parse_args()
+
+    lora_dirs = list(args.lora_dirs)
+    if args.comfyui:
+        lora_dirs.extend(comfyui_lora_dirs(args.comfyui))
+    if not lora_dirs:
+        parser.error("give LoRA directories or --comfyui")
+
+    lora_index = package.import_module("lora_index")
+    lora_snapshot = package.import_module("lora_snapshot")
+    lora_metadata = package.import_module("lora_metadata")
+    lora_preload = package.import_module("lora_preload")
+
+    snapshot = step("Scanning LoRA directories", lora_snapshot.get_lora_snapshots().refresh, lora_dirs)
+    print(f"{len(snapshot.names)} LoRAs, list version {snapshot.version}")
+    headers = step("Indexing metadata", lora_metadata.build_metadata_index, lora_dirs)
+    print(f"{headers} headers read")
+    if args.fingerprints:
+        lora_fingerprint = package.import_module("lora_fingerprint")
+        groups = step("Fingerprinting LoRAs", lora_fingerprint.find_duplicate_loras, lora_dirs)
+        for group in groups:
+            print("Identical: " + ", ".join(group))
+
+    config = lora_preload.read_preload_config(args.preload_config)
+    if config is None:
+        print("No preload config")
+        return 0
+    missing = [name for name in config["loras"] if lora_index.resolve_lora_path(name, lora_dirs) is None]
+    print(f"Preload set: {len(config['loras']) - len(missing)} of {len(config['loras'])} LoRAs found")
+    for name in missing:
+        print(f"Missing: {name}")
+    return 1 if missing else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())